@@ -0,0 +1,142 @@
+import argparse
+import collections
+import multiprocessing
+import os
+import time
+
+import cv2
+
+import filters
+from cameo import FILTER_FACTORIES
+
+IMAGE_EXTENSIONS = ('.bmp', '.jpeg', '.jpg', '.png', '.tif', '.tiff') # Extensiones de imagen aceptadas
+
+_pipeline = None # Cadena de filtros de cada proceso de trabajo
+
+def createPipeline(filterName='portra', withStrokeEdges=True): # Cadena de filtros equivalente a Cameo.run
+    stages = []
+    if withStrokeEdges: # Resaltar bordes antes del filtro activo
+        stages.append(filters.StrokeEdgesFilter())
+    if filterName is not None: # Filtro activo del catálogo
+        stages.append(FILTER_FACTORIES[filterName]())
+    return filters.FilterChain(*stages)
+
+def processVideo(inputPath, outputPath, filterName='portra', withStrokeEdges=True,
+                 processes=None, chunkSize=8, fourcc='MJPG'): # Procesar un archivo de video
+    """Filtra un video en bloques de frames y lo escribe en el mismo orden.
+
+    Devuelve un diccionario con los frames procesados, los segundos
+    transcurridos y los frames por segundo.
+    """
+    capture = cv2.VideoCapture(inputPath)
+    if not capture.isOpened():
+        raise IOError(f"No se pudo abrir el video: {inputPath}")
+    fps = capture.get(cv2.CAP_PROP_FPS) or 30.0 # FPS del original (30 si no se conoce)
+    processes = processes or os.cpu_count() or 1
+    videoWriter = None
+    frameCount = 0
+    startTime = time.perf_counter()
+    with _createPool(processes, filterName, withStrokeEdges) as pool:
+        pending = collections.deque() # Bloques en vuelo, en orden de lectura
+        for chunk in _readChunks(capture, chunkSize):
+            pending.append(pool.apply_async(_processFrames, (chunk,)))
+            if len(pending) < 2 * processes: # Limitar los bloques en memoria
+                continue
+            videoWriter, written = _writeFrames(pending.popleft().get(), videoWriter, outputPath, fourcc, fps)
+            frameCount += written
+        while pending: # Escribir los bloques restantes
+            videoWriter, written = _writeFrames(pending.popleft().get(), videoWriter, outputPath, fourcc, fps)
+            frameCount += written
+    capture.release()
+    if videoWriter is not None:
+        videoWriter.release()
+    return _stats(frameCount, startTime)
+
+def processImages(inputDir, outputDir, filterName='portra', withStrokeEdges=True, processes=None): # Procesar una carpeta de imágenes
+    """Filtra cada imagen de inputDir y la guarda con el mismo nombre en outputDir.
+
+    Devuelve un diccionario con las imágenes procesadas, los segundos
+    transcurridos y las imágenes por segundo.
+    """
+    names = sorted(name for name in os.listdir(inputDir)
+                   if name.lower().endswith(IMAGE_EXTENSIONS)) # Orden estable
+    os.makedirs(outputDir, exist_ok=True)
+    jobs = [(os.path.join(inputDir, name), os.path.join(outputDir, name)) for name in names]
+    processes = processes or os.cpu_count() or 1
+    imageCount = 0
+    startTime = time.perf_counter()
+    with _createPool(processes, filterName, withStrokeEdges) as pool:
+        for ok in pool.imap(_processImageFile, jobs, chunksize=max(1, len(jobs) // (4 * processes))):
+            imageCount += ok
+    return _stats(imageCount, startTime)
+
+def _createPool(processes, filterName, withStrokeEdges): # Grupo de procesos con la cadena ya construida
+    context = multiprocessing.get_context('spawn') # Evitar heredar hilos de OpenCV con fork
+    return context.Pool(processes, _initWorker, (filterName, withStrokeEdges))
+
+def _initWorker(filterName, withStrokeEdges): # Inicializar un proceso de trabajo
+    global _pipeline
+    cv2.setNumThreads(1) # Un núcleo por proceso: el paralelismo lo da el grupo
+    _pipeline = createPipeline(filterName, withStrokeEdges)
+
+def _processFrames(frames): # Filtrar un bloque de frames (en el proceso de trabajo)
+    for frame in frames:
+        _pipeline.apply(frame, frame)
+    return frames
+
+def _processImageFile(job): # Filtrar un archivo de imagen (en el proceso de trabajo)
+    inputPath, outputPath = job
+    image = cv2.imread(inputPath, cv2.IMREAD_COLOR)
+    if image is None: # No es una imagen legible
+        return 0
+    _pipeline.apply(image, image)
+    return int(cv2.imwrite(outputPath, image))
+
+def _readChunks(capture, chunkSize): # Leer el video en bloques de frames
+    chunk = []
+    while True:
+        ok, frame = capture.read()
+        if not ok:
+            break
+        chunk.append(frame)
+        if len(chunk) == chunkSize:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+def _writeFrames(frames, videoWriter, outputPath, fourcc, fps): # Escribir un bloque procesado
+    for frame in frames:
+        if videoWriter is None: # Crear el escritor con el tamaño del primer frame
+            videoWriter = cv2.VideoWriter(outputPath, cv2.VideoWriter_fourcc(*fourcc), fps,
+                                          (frame.shape[1], frame.shape[0]))
+        videoWriter.write(frame)
+    return videoWriter, len(frames)
+
+def _stats(frameCount, startTime): # Resumen de rendimiento
+    seconds = time.perf_counter() - startTime
+    return {'frames': frameCount, 'seconds': seconds, 'fps': frameCount / seconds if seconds > 0 else 0.0}
+
+def main(argv=None): # Punto de entrada de la línea de comandos
+    parser = argparse.ArgumentParser(description='Aplica los filtros de Cameo a videos o carpetas de imágenes.')
+    parser.add_argument('mode', choices=('video', 'images'), help='tipo de entrada')
+    parser.add_argument('input', help='video o carpeta de entrada')
+    parser.add_argument('output', help='video o carpeta de salida')
+    parser.add_argument('--filter', default='portra', choices=sorted(FILTER_FACTORIES) + ['none'],
+                        help='filtro del catálogo de Cameo (none: solo strokeEdges)')
+    parser.add_argument('--no-stroke-edges', action='store_true', help='no aplicar strokeEdges')
+    parser.add_argument('--processes', type=int, default=None, help='procesos de trabajo (por defecto, uno por núcleo)')
+    parser.add_argument('--chunk-size', type=int, default=8, help='frames por bloque de video')
+    parser.add_argument('--fourcc', default='MJPG', help='códec del video de salida')
+    args = parser.parse_args(argv)
+    filterName = None if args.filter == 'none' else args.filter
+    if args.mode == 'video':
+        stats = processVideo(args.input, args.output, filterName, not args.no_stroke_edges,
+                             args.processes, args.chunk_size, args.fourcc)
+    else:
+        stats = processImages(args.input, args.output, filterName, not args.no_stroke_edges, args.processes)
+    print(f"{stats['frames']} frames en {stats['seconds']:.2f} s ({stats['fps']:.1f} fps)")
+
+# Punto de entrada del programa
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,207 @@
+import argparse
+import json
+import platform
+import sys
+import time
+
+import cv2
+import numpy
+
+import filters
+from cameo import FILTER_FACTORIES
+from managers import CaptureManager, SyntheticCapture, createSyntheticFrame
+
+RESOLUTIONS = { # Resoluciones de prueba (ancho, alto)
+    '480p': (640, 480),
+    '720p': (1280, 720),
+    '1080p': (1920, 1080),
+    '4k': (3840, 2160)
+}
+
+def benchmarkCases(): # Casos de prueba: nombre -> función que crea un callable(src, dst)
+    cases = {}
+    for name, factory in FILTER_FACTORIES.items(): # Todo el catálogo de Cameo
+        cases[name] = lambda factory=factory: _bindFilter(factory())
+    cases['strokeEdges'] = lambda: filters.StrokeEdgesFilter().apply # Filtro de bordes
+    cases['pipeline'] = lambda: filters.FilterChain( # Cadena completa por frame de Cameo.run
+        filters.StrokeEdgesFilter(), FILTER_FACTORIES['portra']()).apply
+    return cases
+
+def measure(func, iterations, warmup=2): # Tiempos por iteración en milisegundos
+    for _ in range(warmup): # Calentar caches y buffers
+        func()
+    timings = numpy.empty(iterations)
+    for i in range(iterations):
+        startTime = time.perf_counter()
+        func()
+        timings[i] = (time.perf_counter() - startTime) * 1000
+    return timings
+
+def summarize(timings, width, height): # Mediana, p95 y megapíxeles por segundo
+    median = float(numpy.median(timings))
+    return {
+        'medianMs': median,
+        'p95Ms': float(numpy.percentile(timings, 95)),
+        'mpixPerSecond': width * height / 1e6 / (median / 1000) if median > 0 else 0.0,
+        'iterations': len(timings)
+    }
+
+def runBenchmarks(caseNames=None, resolutions=None, iterations=15, warmup=2, log=None): # Ejecutar la suite
+    """Devuelve un diccionario serializable con metadatos y resultados.
+
+    results[caso][resolución] contiene medianMs, p95Ms, mpixPerSecond e
+    iterations. El caso captureManager mide un ciclo enterFrame/exitFrame
+    con una fuente sintética, sin ventana ni escritura.
+    """
+    cases = benchmarkCases()
+    caseNames = caseNames or list(cases) + ['captureManager']
+    unknown = [name for name in caseNames if name not in cases and name != 'captureManager']
+    if unknown:
+        raise ValueError(f"Casos desconocidos: {', '.join(unknown)}")
+    resolutions = resolutions or list(RESOLUTIONS)
+    results = {}
+    for caseName in caseNames:
+        results[caseName] = {}
+        for resolution in resolutions:
+            width, height = RESOLUTIONS[resolution]
+            if caseName == 'captureManager':
+                step = _captureManagerStep(width, height)
+            else:
+                src = createSyntheticFrame(width, height) # Mismo frame en cada ejecución
+                dst = numpy.empty_like(src)
+                apply = cases[caseName]()
+                step = lambda apply=apply, src=src, dst=dst: apply(src, dst)
+            summary = summarize(measure(step, iterations, warmup), width, height)
+            results[caseName][resolution] = summary
+            if log is not None:
+                log(f"{caseName:>14} {resolution:>6} {summary['medianMs']:9.2f} ms "
+                    f"p95 {summary['p95Ms']:9.2f} ms {summary['mpixPerSecond']:8.1f} MPix/s")
+    return {'metadata': _metadata(), 'results': results}
+
+def compareResults(baseline, current, threshold=0.10): # Comparar contra una línea base
+    """Devuelve una lista de (caso, resolución, base ms, actual ms, cambio, es regresión)."""
+    rows = []
+    for caseName, byResolution in current['results'].items():
+        for resolution, summary in byResolution.items():
+            baseSummary = baseline['results'].get(caseName, {}).get(resolution)
+            if baseSummary is None: # Caso nuevo: nada que comparar
+                continue
+            change = summary['medianMs'] / baseSummary['medianMs'] - 1
+            rows.append((caseName, resolution, baseSummary['medianMs'], summary['medianMs'],
+                         change, change > threshold))
+    return rows
+
+def convolutionCases(): # Kernels que cubren cada ruta de VConvolutionFilter
+    gaussian = cv2.getGaussianKernel(7, 0)
+    return {
+        'box5x5': numpy.ones((5, 5)) / 25, # cv2.blur
+        'box1x15': numpy.ones((1, 15)) / 15, # cv2.blur, 1-D
+        'gaussian7x7': gaussian @ gaussian.T, # Separable
+        'row1x3': numpy.array([[1, 2, 1]]) / 4, # 1-D horizontal
+        'column3x1': numpy.array([[1], [2], [1]]) / 4, # 1-D vertical
+        'derivative1x3': numpy.array([[-1, 0, 1]]), # 1-D antisimétrico
+        'sharpen': filters.SharpenFilter().kernel, # Genérico
+        'emboss': filters.EmbossFilter().kernel, # Genérico
+        'edges': filters.FindEdgesFilter().kernel # Genérico
+    }
+
+def chainCases(): # Cadenas de filtros: las que se componen en un kernel y las que no
+    return {
+        'blur+gaussian': lambda: (filters.BlurFilter(), filters.VConvolutionFilter(convolutionCases()['gaussian7x7'])),
+        'sharpen+emboss': lambda: (filters.SharpenFilter(), filters.EmbossFilter()),
+        'sharpen+edges': lambda: (filters.SharpenFilter(), filters.FindEdgesFilter()),
+        'portra+invert': lambda: (filters.BGRPortraCurveFilter(), filters.InvertFilter())
+    }
+
+def verifyFilters(resolution='480p', tolerance=1): # Comparar cada ruta rápida con su referencia
+    """Devuelve una lista de (caso, ruta, diferencia máxima, diferencia media, es error)."""
+    width, height = RESOLUTIONS[resolution]
+    src = createSyntheticFrame(width, height)
+    rows = []
+    for caseName, kernel in convolutionCases().items(): # Contra cv2.filter2D
+        convolutionFilter = filters.VConvolutionFilter(kernel)
+        path = 'box' if convolutionFilter.cost == 2 else 'separable' if convolutionFilter.isSeparable else 'generic'
+        maxDifference, meanDifference = filters.compareConvolution(src, convolutionFilter)
+        rows.append((caseName, path, maxDifference, meanDifference, maxDifference > tolerance))
+    for caseName, createFilters in chainCases().items(): # Contra aplicar los filtros uno tras otro
+        filterObjs = createFilters()
+        stages = len(filters.FilterChain(*filterObjs).filters)
+        maxDifference, meanDifference = filters.compareFilterChain(src, *filterObjs)
+        rows.append((caseName, f"{stages} pasada" + ("s" if stages != 1 else ""), maxDifference, meanDifference, maxDifference > tolerance))
+    maxDifference, meanDifference = filters.compareStrokeEdges(src) # Contra la implementación original
+    rows.append(('strokeEdges', 'uint8', maxDifference, meanDifference, maxDifference > tolerance))
+    return rows
+
+def _bindFilter(filterObj): # Llamable (src, dst) para funciones y objetos con apply
+    return lambda src, dst: filters.applyFilter(filterObj, src, dst)
+
+def _captureManagerStep(width, height): # Un ciclo de CaptureManager con fuente sintética
+    captureManager = CaptureManager(SyntheticCapture(width, height))
+    def step():
+        captureManager.enterFrame()
+        captureManager.frame # Forzar retrieve()
+        captureManager.exitFrame()
+    return step
+
+def _metadata(): # Entorno en el que se midió
+    return {
+        'python': platform.python_version(),
+        'opencv': cv2.__version__,
+        'numpy': numpy.__version__,
+        'platform': platform.platform(),
+        'machine': platform.machine(),
+        'opencvThreads': cv2.getNumThreads(),
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S')
+    }
+
+def main(argv=None): # Punto de entrada de la línea de comandos
+    parser = argparse.ArgumentParser(description='Benchmark reproducible de los filtros de Cameo.')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    runParser = subparsers.add_parser('run', help='medir y guardar resultados en JSON')
+    runParser.add_argument('--cases', nargs='+', default=None,
+                           help='casos a medir (por defecto todos: catálogo, strokeEdges, pipeline, captureManager)')
+    runParser.add_argument('--resolutions', nargs='+', default=None, choices=list(RESOLUTIONS))
+    runParser.add_argument('--iterations', type=int, default=15, help='iteraciones medidas por caso')
+    runParser.add_argument('--warmup', type=int, default=2, help='iteraciones de calentamiento')
+    runParser.add_argument('--output', default='benchmark.json', help='archivo JSON de resultados')
+    compareParser = subparsers.add_parser('compare', help='comparar resultados contra una línea base')
+    compareParser.add_argument('baseline', help='JSON de la línea base')
+    compareParser.add_argument('current', help='JSON de los resultados actuales')
+    compareParser.add_argument('--threshold', type=float, default=0.10,
+                               help='aumento relativo de la mediana considerado regresión (0.10 = 10%%)')
+    verifyParser = subparsers.add_parser('verify', help='comparar las rutas rápidas con sus referencias')
+    verifyParser.add_argument('--resolution', default='480p', choices=list(RESOLUTIONS))
+    verifyParser.add_argument('--tolerance', type=int, default=1, help='diferencia máxima admitida (niveles)')
+    args = parser.parse_args(argv)
+
+    if args.command == 'verify':
+        rows = verifyFilters(args.resolution, args.tolerance)
+        for caseName, path, maxDifference, meanDifference, isError in rows:
+            mark = 'ERROR' if isError else ''
+            print(f"{caseName:>14} {path:>9} máx {maxDifference:4d} media {meanDifference:.4f} {mark}")
+        errors = sum(row[4] for row in rows)
+        print(f"{errors} casos fuera de tolerancia ({args.tolerance})")
+        return 1 if errors else 0
+
+    if args.command == 'run':
+        report = runBenchmarks(args.cases, args.resolutions, args.iterations, args.warmup, log=print)
+        with open(args.output, 'w') as outputFile:
+            json.dump(report, outputFile, indent=2)
+        print(f"Resultados guardados en {args.output}")
+        return 0
+
+    with open(args.baseline) as baselineFile:
+        baseline = json.load(baselineFile)
+    with open(args.current) as currentFile:
+        current = json.load(currentFile)
+    rows = compareResults(baseline, current, args.threshold)
+    for caseName, resolution, baseMs, currentMs, change, isRegression in rows:
+        mark = 'REGRESIÓN' if isRegression else ''
+        print(f"{caseName:>14} {resolution:>6} {baseMs:9.2f} -> {currentMs:9.2f} ms {change:+8.1%} {mark}")
+    regressions = sum(row[5] for row in rows)
+    print(f"{regressions} regresiones por encima de {args.threshold:.0%}")
+    return 1 if regressions else 0
+
+# Punto de entrada del programa
+if __name__ == "__main__":
+    sys.exit(main())
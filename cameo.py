@@ -1,48 +1,189 @@
+import sys
+import time
+_processStartTime = time.perf_counter() # Inicio del proceso, para medir el arranque hasta el primer frame
+
 import cv2
 import filters
-from managers import WindowManager, CaptureManager
+import incremental
+import metrics
+import scheduler
+import sharedframes
+import tiling
+from managers import WindowManager, CaptureManager, MultiSourceCaptureManager
+
+# Catálogo de filtros disponibles: cada entrada crea el filtro la primera vez que se selecciona
+FILTER_FACTORIES = {
+    'portra': filters.BGRPortraCurveFilter, # Filtro Portra
+    'provia': filters.BGRProviaCurveFilter, # Filtro Provia
+    'velvia': filters.BGRVelviaCurveFilter, # Filtro Velvia
+    'cross': filters.BGRCrossProcessCurveFilter, # Filtro Cross Process
+    'sharpen': filters.SharpenFilter, # Filtro de nitidez
+    'emboss': filters.EmbossFilter, # Filtro de relieve
+    'blur': filters.BlurFilter, # Filtro de desenfoque
+    'edges': filters.FindEdgesFilter, # Filtro de detección de bordes
+    'rc': lambda: filters.recolorRC, # Filtro de recoloración RC
+    'rgv': lambda: filters.recolorRGV, # Filtro de recoloración RGV
+    'cmv': lambda: filters.recolorCMV # Filtro de recoloración CMV
+}
 
 class Cameo(object): # Clase principal de la aplicación Cameo
-    def __init__(self): # Inicializador de la clase Cameo
+    def __init__(self, metricsCsvPath=None, metricsPrometheusPath=None, tileWorkers=None,
+                 sharedFramesName=None, targetFps=30.0, preRollSeconds=5.0,
+                 videoSegmentSeconds=60.0, incrementalMode=False, sources=None,
+                 layout=MultiSourceCaptureManager.MOSAIC, sourceWorkers=None): # Inicializador de la clase Cameo
         self._windowManager = WindowManager('Cameo', self.onKeypress) # Ventana principal
-        self._captureManager = CaptureManager(cv2.VideoCapture(0), self._windowManager, True) # Captura de video
+        self._stageTimer = metrics.StageTimer(csvPath=metricsCsvPath,
+                                              prometheusPath=metricsPrometheusPath) # Latencia por etapa
+        self._sourceWindowManagers = [] # Ventanas de las fuentes 1..N-1 con SEPARATE
+        self._sourceFilters = [] # Filtro activo de cada fuente (varias fuentes)
+        self._selectedSource = 0 # Fuente a la que se aplican las teclas de filtro
+        self._sourceProcessors = [] # Procesador incremental de cada fuente (varias fuentes)
+        if sources is None: # Una sola cámara
+            self._captureManager = CaptureManager(cv2.VideoCapture(0), self._windowManager, True,
+                                                  threaded=True, stageTimer=self._stageTimer,
+                                                  preRollSeconds=preRollSeconds) # Captura de video en un hilo aparte
+        else: # Varias fuentes procesadas por un grupo de hilos compartido
+            if layout == MultiSourceCaptureManager.SEPARATE: # La fuente 0 usa la ventana principal
+                self._sourceWindowManagers = [WindowManager(f"Cameo {index}: {source}")
+                                              for index, source in enumerate(sources) if index > 0]
+            self._sourceFilters = ['portra'] * len(sources)
+            self._sourceProcessors = [None] * len(sources)
+            self._captureManager = MultiSourceCaptureManager(
+                sources, self._processSourceFrame, sourceWorkers, layout,
+                [self._windowManager] + self._sourceWindowManagers, stageTimer=self._stageTimer)
+        self._videoSegmentSeconds = videoSegmentSeconds # Duración de cada archivo de la grabación
+        self._sharedFrames = None # Publicación de frames a otros procesos (opcional)
+        if sharedFramesName is not None:
+            self._sharedFrames = sharedframes.SharedFramePublisher(sharedFramesName)
+            self._captureManager.addFrameSink(self._sharedFrames)
+        self._tiledExecutor = tiling.TiledExecutor(tileWorkers) # Filtros por franjas en varios núcleos
+        self._strokeEdges = filters.StrokeEdgesFilter() # Filtro de bordes con buffers reutilizables
+        self._scheduler = None # Degradación de calidad para mantener los FPS (None: desactivada)
+        if targetFps is not None and sources is None: # Con varias fuentes el presupuesto no es por frame
+            self._scheduler = scheduler.FrameBudgetScheduler(targetFps)
+        self._scaledFrame = None # Buffer reutilizable para procesar a menor resolución
+        self._incrementalMode = incrementalMode # Refiltrar solo las zonas que cambian (cámaras fijas)
+        self._incrementalProcessors = {} # Procesador incremental del filtro activo, con y sin strokeEdges
         self._activeFilter = 'portra'  # Filtro inicial
+        self._filterMap = {} # Filtros ya construidos, por nombre
+        self._firstFrameTime = None # Segundos desde el inicio del proceso hasta el primer frame
+        if self._sourceFilters: # Construir en este hilo los filtros que usarán los hilos del grupo
+            self._getFilter(self._activeFilter)
+            self._updateSourceLabels()
 
-        # Diccionario de filtros disponibles
-        self._filterMap = {
-            'portra': filters.BGRPortraCurveFilter(), # Filtro Portra
-            'provia': filters.BGRProviaCurveFilter(), # Filtro Provia
-            'velvia': filters.BGRVelviaCurveFilter(), # Filtro Velvia
-            'cross': filters.BGRCrossProcessCurveFilter(), # Filtro Cross Process
-            'sharpen': filters.SharpenFilter(), # Filtro de nitidez
-            'emboss': filters.EmbossFilter(), # Filtro de relieve
-            'blur': filters.BlurFilter(), # Filtro de desenfoque
-            'edges': filters.FindEdgesFilter(), # Filtro de detección de bordes
-            'rc': filters.recolorRC, # Filtro de recoloración RC
-            'rgv': filters.recolorRGV, # Filtro de recoloración RGV
-            'cmv': filters.recolorCMV # Filtro de recoloración CMV
-        }
+    @property
+    def firstFrameTime(self): # Tiempo de arranque en frío hasta el primer frame mostrado
+        return self._firstFrameTime
+
+    def _getFilter(self, name): # Construir el filtro la primera vez que se selecciona
+        if name not in self._filterMap:
+            self._filterMap[name] = FILTER_FACTORIES[name]()
+        return self._filterMap[name]
 
     def run(self): #Función para ejecutar la aplicación
         """Run the main loop."""
         self._windowManager.createWindow() # Crear la ventana principal
+        if isinstance(self._captureManager, MultiSourceCaptureManager):
+            self._runMultiSource()
+            return
         while self._windowManager.isWindowCreated: # Bucle principal mientras la ventana esté abierta
+            self._stageTimer.beginFrame() # Inicio de la medición del frame
             self._captureManager.enterFrame() # Capturar un nuevo frame
             frame = self._captureManager.frame # Obtener el frame capturado
-            
+            if frame is not None and self._scheduler is not None and self._scheduler.shouldDropFrame():
+                self._scheduler.skipFrame() # Nivel más bajo: descartar el frame sin procesarlo
+                self._captureManager.discardFrame()
+            else:
+                if frame is not None: # El hilo de captura puede no tener frame todavía
+                    self._processFrame(frame)
+                self._captureManager.exitFrame() # Procesar el frame capturado
+            if frame is not None and self._firstFrameTime is None: # Medir el arranque en frío
+                self._firstFrameTime = time.perf_counter() - _processStartTime
+                print(f"Primer frame en {self._firstFrameTime:.3f} s")
+            self._stageTimer.mark()
+            self._windowManager.processEvents() # Procesar eventos de la ventana
+            self._stageTimer.lap('waitKey')
+            self._stageTimer.endFrame() # Fin de la medición del frame
+        self._captureManager.release() # Detener el hilo de captura y liberar la cámara
+        self._tiledExecutor.shutdown() # Detener los hilos de las franjas
+        if self._sharedFrames is not None: # Eliminar el segmento de memoria compartida
+            self._sharedFrames.close()
+
+    def _runMultiSource(self): # Bucle principal con varias fuentes
+        for windowManager in self._sourceWindowManagers:
+            windowManager.createWindow()
+        while self._windowManager.isWindowCreated:
+            self._stageTimer.beginFrame() # Inicio de la medición de la vuelta
+            self._captureManager.update() # Repartir, recoger y mostrar los frames de todas las fuentes
+            self._stageTimer.mark()
+            self._windowManager.processEvents() # Procesar eventos de la ventana
+            self._stageTimer.lap('waitKey')
+            self._stageTimer.endFrame() # Fin de la medición de la vuelta
+        self._captureManager.release() # Detener el grupo de hilos y liberar las fuentes
+        for windowManager in self._sourceWindowManagers:
+            windowManager.destroyWindow()
+        if self._sharedFrames is not None: # Eliminar el segmento de memoria compartida
+            self._sharedFrames.close()
+
+    def _processSourceFrame(self, index, frame): # Procesar el frame de una fuente (en un hilo del grupo)
+        activeFilter = self._getFilter(self._sourceFilters[index]) # Los filtros y sus tablas se comparten entre fuentes
+        if self._incrementalMode: # Cada fuente tiene su procesador (un solo trabajo en curso por fuente)
+            processor = self._sourceProcessors[index]
+            if processor is None:
+                processor = self._sourceProcessors[index] = incremental.IncrementalProcessor(
+                    filters.FilterChain(self._strokeEdges, activeFilter))
+            processor.apply(frame, frame)
+            return
+        filters.applyFilter(self._strokeEdges, frame, frame)
+        filters.applyFilter(activeFilter, frame, frame)
+
+    def _updateSourceLabels(self): # Filtro de cada fuente en el resumen del mosaico, con * en la seleccionada
+        for source in self._captureManager.sources:
+            selected = '*' if source.index == self._selectedSource else ''
+            source.label = f"[{self._sourceFilters[source.index]}]{selected}"
+
+    @property
+    def incrementalProcessors(self): # Procesadores incrementales actuales (fracción de baldosas recalculadas)
+        return list(self._incrementalProcessors.values())
+
+    def _processFrame(self, frame): # Aplicar strokeEdges y el filtro activo según el nivel de calidad
+        quality = None
+        if self._scheduler is not None:
+            quality = self._scheduler.beginFrame() # Medir el procesamiento del frame
+            self._strokeEdges.blurKsize = quality.blurKsize
+            self._strokeEdges.edgeKsize = quality.edgeKsize
+        target = frame
+        if quality is not None and quality.processScale < 1.0: # Procesar a menor resolución
+            height, width = frame.shape[:2]
+            size = (max(1, int(width * quality.processScale)), max(1, int(height * quality.processScale)))
+            self._scaledFrame = cv2.resize(frame, size, self._scaledFrame,
+                                           interpolation=cv2.INTER_AREA) # OpenCV rehace el buffer si cambia el tamaño
+            target = self._scaledFrame
+
+        if self._incrementalMode: # Bordes y filtro activo solo en las baldosas que cambiaron
+            strokeEdges = self._scheduler is None or self._scheduler.shouldStrokeEdges()
+            processor = self._incrementalProcessors.get(strokeEdges)
+            if processor is None: # Una cadena por caso: los niveles que alternan strokeEdges usan las dos
+                activeFilter = self._getFilter(self._activeFilter)
+                chain = filters.FilterChain(self._strokeEdges, activeFilter) if strokeEdges else filters.FilterChain(activeFilter)
+                processor = self._incrementalProcessors[strokeEdges] = incremental.IncrementalProcessor(chain)
+            processor.apply(target, target)
+            self._stageTimer.lap('incremental')
+        else:
             # Aplicar filtro de bordes al frame
-            filters.strokeEdges(frame, frame) 
+            if self._scheduler is None or self._scheduler.shouldStrokeEdges():
+                self._tiledExecutor.run(self._strokeEdges, target, target)
+            self._stageTimer.lap('strokeEdges')
 
             # Aplicar el filtro activo
-            filterObj = self._filterMap.get(self._activeFilter)
-            if callable(filterObj):  # Si es función como recolorRC es decir, que se puede llamar directamente
-                filterObj(frame, frame)
-            else:  # Si es clase con método apply, es decir, que necesita instanciarse
-                filterObj.apply(frame, frame)
+            self._tiledExecutor.run(self._getFilter(self._activeFilter), target, target)
+            self._stageTimer.lap('filter')
 
-
-            self._captureManager.exitFrame() # Procesar el frame capturado
-            self._windowManager.processEvents() # Procesar eventos de la ventana
+        if target is not frame: # Volver a la resolución original
+            cv2.resize(target, frame.shape[1::-1], frame, interpolation=cv2.INTER_LINEAR)
+        if self._scheduler is not None and self._scheduler.endFrame(): # Cambio de nivel de calidad
+            self._incrementalProcessors.clear() # La salida guardada usaba otros kernels
+            print(f"Calidad: {self._scheduler.quality.name} ({self._scheduler.budgetUsage:.0%} del presupuesto)")
 
     def onKeypress(self, keycode):
         """Manejar una pulsación de tecla.
@@ -50,11 +191,13 @@ class Cameo(object): # Clase principal de la aplicación Cameo
            tab: start/stop recording a screencast
            sc: quit the program
         """
+        previousFilter = self._activeFilter # Solo las teclas de filtro lo cambian
         if keycode == 32:  # al prescionar la tecla espacio: tomar captura de pantalla
             self._captureManager.writeImage('screenshot.png')
         elif keycode == 9:  # al prescionar la tecla tab: grabar video
-            if not self._captureManager._videoWriter: # Si no se está grabando, iniciar grabación
-                self._captureManager.startWritingVideo('screencast.avi')
+            if not self._captureManager.isWritingVideo: # Si no se está grabando, iniciar grabación
+                self._captureManager.startWritingVideo('screencast.avi',
+                                                       segmentSeconds=self._videoSegmentSeconds)
             else: # Si se está grabando, detener grabación
                 self._captureManager.stopWritingVideo()
         elif keycode == 27:  # al prescionar la tecla esc: salir del programa
@@ -82,9 +225,36 @@ class Cameo(object): # Clase principal de la aplicación Cameo
             self._activeFilter = 'rgv'
         elif keycode == ord('q'):
             self._activeFilter = 'cmv'
+        elif keycode == ord('m'): # Mostrar u ocultar las latencias por etapa
+            self._stageTimer.showOverlay = not self._stageTimer.showOverlay
+            return
+        elif keycode == ord('n') and self._sourceFilters: # Seleccionar la siguiente fuente
+            self._selectedSource = (self._selectedSource + 1) % len(self._sourceFilters)
+            self._activeFilter = self._sourceFilters[self._selectedSource]
+            self._updateSourceLabels()
+            print(f"Fuente seleccionada: {self._selectedSource} ({self._activeFilter})")
+            return
+        elif keycode == ord('i'): # Activar o desactivar el modo incremental
+            self._incrementalMode = not self._incrementalMode
+            processors = [processor for processor in self.incrementalProcessors + self._sourceProcessors
+                          if processor is not None]
+            for processor in processors:
+                print(f"Baldosas recalculadas: {processor.meanRecomputedFraction:.0%} en promedio")
+            self._incrementalProcessors.clear()
+            self._sourceProcessors = [None] * len(self._sourceProcessors)
+            print(f"Modo incremental: {'activado' if self._incrementalMode else 'desactivado'}")
+            return
+
+        if self._activeFilter != previousFilter: # Cambió el filtro activo: la salida guardada ya no sirve
+            self._incrementalProcessors.clear()
+            if self._sourceFilters: # Varias fuentes: el filtro es de la fuente seleccionada
+                self._getFilter(self._activeFilter) # Construirlo aquí y no en los hilos del grupo
+                self._sourceFilters[self._selectedSource] = self._activeFilter
+                self._sourceProcessors[self._selectedSource] = None # La salida guardada usaba otro filtro
+                self._updateSourceLabels()
 
         print(f"Filtro activo: {self._activeFilter}") # Imprimir el filtro activo en la consola
 
 # Punto de entrada del programa
 if __name__ == "__main__":
-    Cameo().run()
+    Cameo(sources=sys.argv[1:] or None).run() # Fuentes opcionales: índices de cámara, archivos o 'synthetic' 
@@ -1,3 +1,5 @@
+import threading
+
 import cv2
 import numpy
 import utils
@@ -21,7 +23,78 @@ def recolorCMV(src, dst): # Recoloración CMV
     cv2.merge((b, g, r), dst) # Combinar canales
 
 # --- Filtro de bordes ---
+class StrokeEdgesFilter(object): # Resaltar bordes sin frames temporales en float
+    """Oscurece los bordes multiplicando cada canal por el Laplaciano invertido.
+
+    Trabaja en uint8 de principio a fin: el producto canal * alfa / 255 se
+    hace con cv2.multiply (saturado, redondeado) y los buffers intermedios se
+    reutilizan (uno por hilo) entre frames del mismo tamaño. Con scale < 1 el desenfoque
+    mediano y el Laplaciano se calculan a menor resolución y la máscara se
+    escala de vuelta al tamaño del frame.
+    """
+    def __init__(self, blurKsize=7, edgeKsize=5, scale=1.0): # Inicializador con tamaños de kernel y escala
+        self.blurKsize = blurKsize # Tamaño del kernel del desenfoque mediano (< 3 lo desactiva)
+        self.edgeKsize = edgeKsize # Tamaño del kernel del Laplaciano
+        self.scale = scale # Escala a la que se calcula la máscara de bordes
+        self._local = threading.local() # Buffers intermedios reutilizables, por hilo
+    def apply(self, src, dst): # Aplicar el filtro
+        rows, cols = src.shape[:2]
+        smallSize = (max(1, round(cols * self.scale)), max(1, round(rows * self.scale))) # Tamaño reducido (ancho, alto)
+        buffers = self._getBuffers(src.shape, smallSize)
+        source = src
+        if 'small' in buffers: # Calcular la máscara a menor resolución
+            source = cv2.resize(src, smallSize, buffers['small'], interpolation=cv2.INTER_AREA)
+        blurKsize = self._scaledKsize(self.blurKsize)
+        if blurKsize >= 3: # Si el tamaño del kernel de desenfoque es mayor o igual a 3
+            source = cv2.medianBlur(source, blurKsize, buffers['blurred']) # Aplicar desenfoque
+        cv2.cvtColor(source, cv2.COLOR_BGR2GRAY, buffers['gray']) # Convertir a escala de grises
+        cv2.Laplacian(buffers['gray'], cv2.CV_8U, buffers['edges'],
+                      ksize=self._scaledKsize(self.edgeKsize)) # Aplicar filtro Laplaciano
+        inverseAlpha = cv2.bitwise_not(buffers['edges'], buffers['edges']) # Invertir: 255 - bordes
+        if 'alpha' in buffers: # Escalar la máscara al tamaño del frame
+            inverseAlpha = cv2.resize(inverseAlpha, (cols, rows), buffers['alpha'], interpolation=cv2.INTER_LINEAR)
+        cv2.cvtColor(inverseAlpha, cv2.COLOR_GRAY2BGR, buffers['alpha3']) # Mismo alfa para los tres canales
+        cv2.multiply(src, buffers['alpha3'], dst, scale=1.0 / 255) # Multiplicar cada canal por el alfa normalizado
+    @property
+    def halo(self): # Filas vecinas que necesita cada fila de salida (None: no se puede dividir en franjas)
+        if self.scale < 1: # El escalado no es local a cada franja
+            return None
+        blurRadius = self.blurKsize // 2 if self.blurKsize >= 3 else 0
+        return blurRadius + max(1, self.edgeKsize // 2) # Mediana seguida del Laplaciano
+    def _scaledKsize(self, ksize): # Tamaño de kernel (impar) a la escala de la máscara
+        if self.scale >= 1 or ksize < 3:
+            return ksize
+        return max(3, int(ksize * self.scale) | 1)
+    def _getBuffers(self, shape, smallSize): # Buffers para esta forma, creados una sola vez por hilo
+        key = (shape, smallSize if self.scale < 1 else None)
+        buffersByKey = getattr(self._local, 'buffersByKey', None)
+        if buffersByKey is None:
+            buffersByKey = self._local.buffersByKey = {}
+        buffers = buffersByKey.get(key)
+        if buffers is None:
+            if len(buffersByKey) >= 4: # Pocas formas por hilo (franjas de distinto alto)
+                buffersByKey.clear()
+            rows, cols = shape[:2]
+            maskRows, maskCols = (smallSize[1], smallSize[0]) if self.scale < 1 else (rows, cols)
+            buffers = buffersByKey[key] = {
+                'blurred': numpy.empty((maskRows, maskCols) + shape[2:], numpy.uint8), # Frame desenfocado
+                'gray': numpy.empty((maskRows, maskCols), numpy.uint8), # Escala de grises
+                'edges': numpy.empty((maskRows, maskCols), numpy.uint8), # Laplaciano invertido
+                'alpha3': numpy.empty(shape, numpy.uint8)} # Alfa replicado en los tres canales
+            if self.scale < 1:
+                buffers['small'] = numpy.empty((maskRows, maskCols) + shape[2:], numpy.uint8) # Frame reducido
+                buffers['alpha'] = numpy.empty((rows, cols), numpy.uint8) # Alfa a tamaño completo
+        return buffers
+
+_strokeEdgesFilters = {} # Filtros reutilizados por strokeEdges, por tamaños de kernel
+
 def strokeEdges(src, dst, blurKsize=7, edgeKsize=5): # Resaltar bordes
+    key = (blurKsize, edgeKsize)
+    if key not in _strokeEdgesFilters: # Crear un filtro (y sus buffers) por combinación de kernels
+        _strokeEdgesFilters[key] = StrokeEdgesFilter(blurKsize, edgeKsize)
+    _strokeEdgesFilters[key].apply(src, dst)
+
+def strokeEdgesReference(src, dst, blurKsize=7, edgeKsize=5): # Implementación original en float64, para comparar
     if blurKsize >= 3: # Si el tamaño del kernel de desenfoque es mayor o igual a 3
         blurredSrc = cv2.medianBlur(src, blurKsize) # Aplicar desenfoque
         graySrc = cv2.cvtColor(blurredSrc, cv2.COLOR_BGR2GRAY) # Convertir a escala de grises
@@ -34,11 +107,76 @@ def strokeEdges(src, dst, blurKsize=7, edgeKsize=5): # Resaltar bordes
         channel[:] = channel * normalizedInverseAlpha # Multiplicar canal por el efecto
     cv2.merge(channels, dst) # Combinar canales
 
+def compareStrokeEdges(src, strokeEdgesFilter=None): # Comparar con la implementación de referencia
+    """Devuelve (diferencia máxima, diferencia media) por píxel y canal."""
+    strokeEdgesFilter = strokeEdgesFilter or StrokeEdgesFilter()
+    expected = numpy.empty_like(src)
+    actual = numpy.empty_like(src)
+    strokeEdgesReference(src, expected, strokeEdgesFilter.blurKsize, strokeEdgesFilter.edgeKsize)
+    strokeEdgesFilter.apply(src, actual)
+    difference = cv2.absdiff(expected, actual)
+    return int(difference.max()), float(difference.mean())
+
+def compareConvolution(src, convolutionFilter): # Comparar la ruta elegida con cv2.filter2D
+    """Devuelve (diferencia máxima, diferencia media) por píxel y canal."""
+    expected = cv2.filter2D(src, -1, convolutionFilter.kernel)
+    actual = numpy.empty_like(src)
+    convolutionFilter.apply(src, actual)
+    difference = cv2.absdiff(expected, actual)
+    return int(difference.max()), float(difference.mean())
+
+def compareFilterChain(src, *filterObjs): # Comparar una cadena con aplicar sus filtros uno tras otro
+    """Devuelve (diferencia máxima, diferencia media) por píxel y canal."""
+    expected = src.copy()
+    for filterObj in filterObjs:
+        applyFilter(filterObj, expected, expected)
+    actual = numpy.empty_like(src)
+    FilterChain(*filterObjs).apply(src, actual)
+    difference = cv2.absdiff(expected, actual)
+    return int(difference.max()), float(difference.mean())
+
 # --- Filtros de convolución ---
 class VConvolutionFilter(object): # Filtro de convolución genérico
+    """Analiza el kernel al construirse y elige la forma más barata de aplicarlo.
+
+    Un kernel uniforme normalizado usa el filtro de caja (cv2.blur), uno
+    separable (rango 1, por ejemplo gaussiano) usa dos pasadas 1-D con
+    cv2.sepFilter2D y el resto usa cv2.filter2D.
+    """
     def __init__(self, kernel): # Inicializador con el kernel de convolución
-        self._kernel = kernel # Guardar el kernel
+        self._kernel = numpy.asarray(kernel, numpy.float32) # Guardar el kernel en float32
+        self._kernelX = self._kernelY = None # Factores 1-D si el kernel es separable
+        rows, cols = self._kernel.shape
+        separated = utils.separateKernel(self._kernel)
+        if utils.isBoxKernel(self._kernel): # Promedio uniforme: coste independiente del tamaño
+            self._apply = self._applyBox
+            self._cost = 2
+        elif separated is not None: # Rango 1: dos pasadas 1-D
+            self._kernelX, self._kernelY = separated
+            self._apply = self._applySeparable
+            self._cost = rows + cols
+        else: # Kernel general
+            self._apply = self._applyGeneric
+            self._cost = rows * cols
+    @property
+    def kernel(self): # Kernel de convolución (float32)
+        return self._kernel
+    @property
+    def isSeparable(self): # Indica si el kernel se aplica en dos pasadas 1-D
+        return self._kernelX is not None
+    @property
+    def cost(self): # Coste relativo por píxel de la ruta elegida
+        return self._cost
+    @property
+    def halo(self): # Vecinos que necesita cada píxel de salida, en filas y en columnas
+        return max(self._kernel.shape) // 2
     def apply(self, src, dst): # Aplicar el filtro
+        self._apply(src, dst) # Aplicar la ruta elegida al construir el filtro
+    def _applyBox(self, src, dst):
+        cv2.blur(src, self._kernel.shape[::-1], dst) # Filtro de caja
+    def _applySeparable(self, src, dst):
+        cv2.sepFilter2D(src, -1, self._kernelX, self._kernelY, dst) # Dos pasadas 1-D
+    def _applyGeneric(self, src, dst):
         cv2.filter2D(src, -1, self._kernel, dst) # Aplicar convolución
 
 class SharpenFilter(VConvolutionFilter): # Filtro de nitidez
@@ -62,36 +200,46 @@ class EmbossFilter(VConvolutionFilter): # Filtro de relieve
         super().__init__(kernel) # Llamar al inicializador de la clase base 
 
 # --- Filtros de curvas ---
-class VFuncFilter(object): # Filtro basado en función de valor
+class LookupTableFilter(object): # Filtro puntual basado en una tabla compilada
+    def __init__(self, lookupTable): # Inicializador con la tabla (entradas x canales)
+        self._lookupTable = lookupTable # Guardar la tabla
+    @property
+    def lookupTable(self): # Tabla compilada, para poder componer filtros puntuales
+        return self._lookupTable
+    @property
+    def halo(self): # Filtro puntual: no necesita vecinos
+        return 0
+    def apply(self, src, dst): # Aplicar el filtro en una sola pasada
+        utils.applyLookupTable(self._lookupTable, src, dst) # Aplicar la tabla a todos los canales
+
+class VFuncFilter(LookupTableFilter): # Filtro basado en función de valor
     def __init__(self, vFunc=None, dtype=numpy.uint8): # Inicializador con función y tipo de dato
-        length = numpy.iinfo(dtype).max + 1 # Longitud del arreglo de búsqueda
-        self._vLookupArray = utils.createLookupArray(vFunc, length) # Crear arreglo de búsqueda
-    def apply(self, src, dst): # Aplicar el filtro
-        srcFlatView = utils.createFlatView(src) # Vista plana del src
-        dstFlatView = utils.createFlatView(dst) # Vista plana del dst
-        utils.applyLookupArray(self._vLookupArray, srcFlatView, dstFlatView) # Aplicar el arreglo de búsqueda
+        super().__init__(utils.createLookupTable([vFunc], dtype)) # Misma tabla para todos los canales
 
-class VCurveFilter(VFuncFilter): # Filtro de curva basado en puntos
+class VCurveFilter(LookupTableFilter): # Filtro de curva basado en puntos
     def __init__(self, vPoints, dtype=numpy.uint8): # Inicializador con puntos de la curva y tipo de dato
-        super().__init__(utils.createCurveFunc(vPoints), dtype) # Llamar al inicializador de la clase base
+        super().__init__(utils.createCurveLookupTable([vPoints], dtype=dtype)) # Tabla compilada (o leída del cache)
+
+class InvertFilter(VFuncFilter): # Filtro de inversión (negativo)
+    def __init__(self, dtype=numpy.uint8): # Inicializador con tipo de dato
+        maxValue = numpy.iinfo(dtype).max # Valor máximo del tipo de dato
+        super().__init__(lambda x: maxValue - x, dtype) # Invertir cada valor
+
+class GainFilter(VFuncFilter): # Filtro de ganancia y desplazamiento
+    def __init__(self, gain=1.0, bias=0.0, dtype=numpy.uint8): # Inicializador con ganancia, desplazamiento y tipo de dato
+        super().__init__(lambda x: x * gain + bias, dtype) # Escalar y desplazar cada valor
 
-class BGRFuncFilter(object): # Filtro basado en función para cada canal BGR
+class BGRFuncFilter(LookupTableFilter): # Filtro basado en función para cada canal BGR
     def __init__(self, vFunc=None, bFunc=None, gFunc=None, rFunc=None, dtype=numpy.uint8): # Inicializador con funciones y tipo de dato
-        length = numpy.iinfo(dtype).max + 1 # Longitud del arreglo de búsqueda
-        self._bLookupArray = utils.createLookupArray(utils.createCompositeFunc(bFunc, vFunc), length) # Crear arreglo de búsqueda para azul
-        self._gLookupArray = utils.createLookupArray(utils.createCompositeFunc(gFunc, vFunc), length) # Crear arreglo de búsqueda para verde
-        self._rLookupArray = utils.createLookupArray(utils.createCompositeFunc(rFunc, vFunc), length) # Crear arreglo de búsqueda para rojo
-    def apply(self, src, dst): # Aplicar el filtro
-        b, g, r = cv2.split(src) # Separar canales
-        utils.applyLookupArray(self._bLookupArray, b, b) # Aplicar arreglo de búsqueda al canal azul
-        utils.applyLookupArray(self._gLookupArray, g, g) # Aplicar arreglo de búsqueda al canal verde
-        utils.applyLookupArray(self._rLookupArray, r, r) # Aplicar arreglo de búsqueda al canal rojo
-        cv2.merge([b, g, r], dst) # Combinar canales
+        super().__init__(utils.createLookupTable([ # Una sola tabla BGR en lugar de tres arreglos
+            utils.createCompositeFunc(bFunc, vFunc), # Función compuesta para azul
+            utils.createCompositeFunc(gFunc, vFunc), # Función compuesta para verde
+            utils.createCompositeFunc(rFunc, vFunc)], dtype)) # Función compuesta para rojo
 
-class BGRCurveFilter(BGRFuncFilter): # Filtro de curva para cada canal BGR
+class BGRCurveFilter(LookupTableFilter): # Filtro de curva para cada canal BGR
     def __init__(self, vPoints=None, bPoints=None, gPoints=None, rPoints=None, dtype=numpy.uint8): # Inicializador con puntos de la curva y tipo de dato
-        super().__init__(utils.createCurveFunc(vPoints), utils.createCurveFunc(bPoints), # Llamar al inicializador de la clase base
-                         utils.createCurveFunc(gPoints), utils.createCurveFunc(rPoints), dtype) # Crear función de curva para cada canal
+        super().__init__(utils.createCurveLookupTable( # Tabla BGR compilada (o leída del cache)
+            [bPoints, gPoints, rPoints], vPoints, dtype))
 
 # --- Filtros de curvas predefinidos ---
 class BGRPortraCurveFilter(BGRCurveFilter): # Filtro de curva Portra
@@ -130,4 +278,66 @@ class BGRCrossProcessCurveFilter(BGRCurveFilter): # Filtro de curva Cross Proces
             bPoints=[(0,20),(255,235)],
             gPoints=[(0,0),(56,39),(208,226),(255,255)],
             rPoints=[(0,0),(56,22),(211,255),(255,255)],
-            dtype=dtype)
\ No newline at end of file
+            dtype=dtype)
+
+# --- Cadenas de filtros ---
+def applyFilter(filterObj, src, dst): # Aplicar un filtro sea función o clase
+    if callable(filterObj): # Si es función como recolorRC es decir, que se puede llamar directamente
+        filterObj(src, dst)
+    else: # Si es clase con método apply
+        filterObj.apply(src, dst)
+
+def filterHalo(filterObj): # Vecinos (filas y columnas) que necesita un filtro (None si no se puede dividir)
+    if filterObj in (recolorRC, recolorRGV, recolorCMV): # Recoloraciones píxel a píxel
+        return 0
+    return getattr(filterObj, 'halo', None)
+
+def _isAveragingKernel(kernel, tolerance=1e-6): # Pesos no negativos que suman como mucho 1: la salida queda en [0, 255]
+    return bool((kernel >= 0).all() and kernel.sum() <= 1 + tolerance)
+
+class FilterChain(object): # Cadena de filtros que se aplican en orden
+    """Aplica varios filtros en secuencia como si fueran uno solo.
+
+    Los filtros puntuales consecutivos (curvas, inversión, ganancia) se
+    componen al construir la cadena en una única tabla, y los filtros de
+    convolución consecutivos en un único kernel, así que cada grupo cuesta
+    una sola pasada por frame. Dos convoluciones solo se componen si ambas
+    son promedios (pesos no negativos que suman como mucho 1, como el
+    desenfoque o el gaussiano), de modo que el resultado intermedio nunca se
+    satura y solo cambia el redondeo, y si el kernel resultante es más
+    barato que ambas pasadas (por ejemplo dos kernels separables).
+    """
+    PASS_COST = 8 # Coste fijo de recorrer el frame una vez, en unidades de VConvolutionFilter.cost
+    def __init__(self, *filterObjs): # Inicializador con los filtros en orden de aplicación
+        self._filters = [] # Etapas después de componer
+        for filterObj in filterObjs:
+            previous = self._filters[-1] if self._filters else None
+            if (isinstance(filterObj, LookupTableFilter) and isinstance(previous, LookupTableFilter)
+                    and filterObj.lookupTable.dtype == previous.lookupTable.dtype): # Componer tablas
+                self._filters[-1] = LookupTableFilter(
+                    utils.composeLookupTables(previous.lookupTable, filterObj.lookupTable))
+            elif (isinstance(filterObj, VConvolutionFilter) and isinstance(previous, VConvolutionFilter)
+                    and all(size % 2 == 1 for size in filterObj.kernel.shape + previous.kernel.shape) # Kernels centrados
+                    and _isAveragingKernel(previous.kernel) and _isAveragingKernel(filterObj.kernel)): # Sin saturación intermedia
+                composed = VConvolutionFilter(utils.composeKernels(previous.kernel, filterObj.kernel))
+                if composed.cost <= previous.cost + filterObj.cost + FilterChain.PASS_COST: # Componer si sale más barato
+                    self._filters[-1] = composed
+                else:
+                    self._filters.append(filterObj)
+            else:
+                self._filters.append(filterObj)
+    @property
+    def filters(self): # Etapas de la cadena después de componer
+        return tuple(self._filters)
+    @property
+    def halo(self): # Suma de los vecinos que necesita cada etapa
+        halos = [filterHalo(filterObj) for filterObj in self._filters]
+        return None if None in halos else sum(halos)
+    def apply(self, src, dst): # Aplicar todas las etapas
+        if not self._filters: # Cadena vacía: copiar
+            if src is not dst:
+                dst[...] = src
+            return
+        applyFilter(self._filters[0], src, dst) # La primera etapa lee de src
+        for filterObj in self._filters[1:]: # El resto trabaja sobre dst
+            applyFilter(filterObj, dst, dst)
@@ -0,0 +1,140 @@
+import cv2
+import numpy
+
+import filters
+
+class IncrementalProcessor(object): # Vuelve a filtrar solo las baldosas que cambiaron
+    """Reutiliza la salida anterior en las zonas del frame que no cambian.
+
+    Cada frame se reduce (INTER_AREA) y se compara por baldosas con una
+    referencia; una baldosa cambia si alguna diferencia supera threshold. La
+    referencia solo se actualiza en las baldosas que cambian, así que los
+    cambios lentos se acumulan hasta superar el umbral. Las baldosas vecinas
+    dentro del halo del filtro también se recalculan, filtrando cada tramo
+    con su halo y copiando solo el interior, por lo que el resultado de las
+    baldosas recalculadas es exacto. Cada refreshInterval frames (o si
+    cambia la mayor parte del frame) se filtra el frame completo. Los
+    filtros sin halo conocido se aplican siempre al frame completo.
+    """
+    def __init__(self, filterObj, tileSize=64, threshold=12, refreshInterval=90,
+                 downsample=4, fullFrameFraction=0.6): # Inicializador con el filtro y los parámetros de las baldosas
+        self._filterObj = filterObj # Filtro (o cadena) a aplicar
+        self._tileSize = tileSize # Lado de cada baldosa en píxeles
+        self._threshold = threshold # Diferencia mínima (0-255) para considerar que una baldosa cambió
+        self._refreshInterval = refreshInterval # Frames entre recálculos completos (acota la deriva)
+        factor = max(f for f in range(1, max(1, downsample) + 1) if tileSize % f == 0) # Divisor exacto del lado
+        self._cellSize = tileSize // factor # Lado de cada baldosa en la imagen reducida
+        self._fullFrameFraction = fullFrameFraction # Fracción de baldosas a partir de la cual se filtra todo
+        self._output = None # Salida del frame anterior
+        self._reference = None # Imagen reducida con la que se compara
+        self._padded = None # Frame extendido a un múltiplo de la baldosa (si hace falta)
+        self._small = None # Buffer de la imagen reducida actual
+        self._difference = None # Buffer de la diferencia
+        self._windowBuffers = {} # Buffers de salida por forma de ventana
+        self._framesSinceRefresh = 0 # Frames desde el último recálculo completo
+        self._lastFraction = 1.0 # Fracción de baldosas recalculadas en el último frame
+        self._fractionSum = 0.0 # Suma de fracciones, para el promedio
+        self._frameCount = 0 # Frames procesados
+
+    @property
+    def filterObj(self):
+        return self._filterObj # Filtro envuelto
+
+    @property
+    def halo(self):
+        return filters.filterHalo(self._filterObj) # Mismo halo que el filtro envuelto
+
+    @property
+    def recomputedFraction(self):
+        return self._lastFraction # Fracción de baldosas recalculadas en el último frame
+
+    @property
+    def meanRecomputedFraction(self): # Fracción promedio desde el inicio
+        return self._fractionSum / self._frameCount if self._frameCount else 0.0
+
+    def reset(self): # Olvidar la salida anterior (p. ej. al cambiar los parámetros del filtro)
+        self._output = None
+
+    def apply(self, src, dst): # Aplicar el filtro reutilizando la salida anterior donde no hubo cambios
+        halo = self.halo
+        rows, cols = src.shape[:2]
+        tileRows = -(-rows // self._tileSize) # Baldosas (redondeando hacia arriba)
+        tileCols = -(-cols // self._tileSize)
+        if halo is None: # No se puede dividir: filtrar todo
+            filters.applyFilter(self._filterObj, src, dst)
+            self._record(1.0)
+            return
+        cell = self._cellSize
+        aligned = src
+        padRows, padCols = tileRows * self._tileSize - rows, tileCols * self._tileSize - cols
+        if padRows or padCols: # Extender los bordes para que cada celda cubra exactamente su baldosa
+            self._padded = cv2.copyMakeBorder(src, 0, padRows, 0, padCols, cv2.BORDER_REPLICATE, self._padded)
+            aligned = self._padded
+        self._small = cv2.resize(aligned, (tileCols * cell, tileRows * cell), self._small,
+                                 interpolation=cv2.INTER_AREA) # Promedio de cada bloque: una celda por baldosa
+        if (self._output is None or self._output.shape != src.shape or self._output.dtype != src.dtype
+                or self._reference.shape != self._small.shape or self._framesSinceRefresh >= self._refreshInterval):
+            self._refresh(src, dst)
+            return
+        self._difference = cv2.absdiff(self._small, self._reference, self._difference)
+        channels = self._small.shape[2] if self._small.ndim == 3 else 1
+        changes = self._difference.reshape(tileRows, cell, tileCols, cell, channels).max(axis=(1, 3, 4))
+        changed = changes > self._threshold # Baldosas que cambiaron
+        if changed.mean() >= self._fullFrameFraction: # Cambió casi todo: más barato filtrar entero
+            self._refresh(src, dst)
+            return
+        self._framesSinceRefresh += 1
+        if changed.any():
+            numpy.copyto(self._reference.reshape(tileRows, cell, tileCols, cell, channels),
+                         self._small.reshape(tileRows, cell, tileCols, cell, channels),
+                         where=changed[:, None, :, None, None]) # Actualizar la referencia solo donde se recalcula
+            haloTiles = -(-halo // self._tileSize) # Baldosas vecinas afectadas por el halo
+            dirty = changed.astype(numpy.uint8)
+            if haloTiles > 0:
+                dirty = cv2.dilate(dirty, numpy.ones((2 * haloTiles + 1, 2 * haloTiles + 1), numpy.uint8))
+            for top, bottom, left, right in self._dirtyRegions(dirty, rows, cols):
+                self._filterRegion(src, halo, top, bottom, left, right)
+            self._record(float(dirty.mean()))
+        else:
+            self._record(0.0)
+        if dst is not self._output:
+            numpy.copyto(dst, self._output)
+
+    def _refresh(self, src, dst): # Filtrar el frame completo y tomarlo como referencia
+        if self._output is None or self._output.shape != src.shape or self._output.dtype != src.dtype:
+            self._output = numpy.empty_like(src)
+        filters.applyFilter(self._filterObj, src, self._output)
+        if self._reference is None or self._reference.shape != self._small.shape:
+            self._reference = numpy.empty_like(self._small)
+        numpy.copyto(self._reference, self._small)
+        numpy.copyto(dst, self._output)
+        self._framesSinceRefresh = 0
+        self._record(1.0)
+
+    def _dirtyRegions(self, dirty, rows, cols): # Tramos horizontales de baldosas sucias, en píxeles
+        tile = self._tileSize
+        for tileRow in range(dirty.shape[0]):
+            flags = numpy.concatenate(([0], dirty[tileRow], [0]))
+            edges = numpy.flatnonzero(numpy.diff(flags)) # Inicios y fines de cada tramo
+            for start, end in zip(edges[::2], edges[1::2]):
+                yield tileRow * tile, min(rows, (tileRow + 1) * tile), start * tile, min(cols, end * tile)
+
+    def _filterRegion(self, src, halo, top, bottom, left, right): # Filtrar un tramo con su halo y copiar el interior
+        rows, cols = src.shape[:2]
+        windowTop, windowBottom = max(0, top - halo), min(rows, bottom + halo)
+        windowLeft, windowRight = max(0, left - halo), min(cols, right + halo)
+        window = src[windowTop:windowBottom, windowLeft:windowRight]
+        key = (window.shape, window.dtype)
+        output = self._windowBuffers.get(key)
+        if output is None:
+            if len(self._windowBuffers) >= 16: # Las formas varían con el contenido: no acumular
+                self._windowBuffers.clear()
+            output = self._windowBuffers[key] = numpy.empty_like(window)
+        filters.applyFilter(self._filterObj, window, output)
+        self._output[top:bottom, left:right] = output[top - windowTop:bottom - windowTop,
+                                                      left - windowLeft:right - windowLeft]
+
+    def _record(self, fraction): # Registrar la fracción de baldosas recalculadas
+        self._lastFraction = fraction
+        self._fractionSum += fraction
+        self._frameCount += 1
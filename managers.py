@@ -1,22 +1,313 @@
+import collections
+import concurrent.futures
+import math
+import os
+import threading
+import time
+
 import cv2
 import numpy
-import time
+
+import writers
+
+class ThreadedCapture(object): # Captura en un hilo productor con un anillo de frames preasignados
+    """Envuelve un cv2.VideoCapture y decodifica frames en segundo plano.
+
+    Expone la misma interfaz que cv2.VideoCapture (grab, retrieve, get, set,
+    isOpened, release), por lo que CaptureManager la usa sin cambios.
+    """
+
+    DROP_OLDEST = 'dropOldest' # Si el anillo está lleno se descarta el frame más antiguo
+    BLOCK = 'block' # Si el anillo está lleno el productor espera al consumidor
+
+    def __init__(self, capture, ringSize=3, dropPolicy=DROP_OLDEST, timeout=1.0,
+                 retryInterval=0.01): # Inicializador con la captura, tamaño del anillo y política
+        if dropPolicy not in (ThreadedCapture.DROP_OLDEST, ThreadedCapture.BLOCK):
+            raise ValueError(f"Política de descarte desconocida: {dropPolicy}")
+        self._capture = capture # Objeto de captura subyacente
+        self._dropPolicy = dropPolicy # Política cuando el anillo está lleno
+        self._timeout = timeout # Tiempo máximo de espera de grab() en segundos
+        self._retryInterval = retryInterval # Espera antes de reintentar un grab() fallido
+        self._failedGrabs = 0 # grab() fallidos de la fuente (reintentados)
+        self._slots = [None] * max(2, ringSize) # Frames preasignados (se crean con el primer frame)
+        self._timestamps = [0.0] * len(self._slots) # Momento de captura de cada frame (time.monotonic)
+        self._free = collections.deque(range(len(self._slots))) # Índices libres para el productor
+        self._ready = collections.deque() # Índices con frames listos, del más antiguo al más nuevo
+        self._held = None # Índice que tiene el consumidor entre grab() y el siguiente grab()
+        self._condition = threading.Condition() # Sincroniza productor y consumidor
+        self._stopped = False # Indica si se pidió detener el hilo
+        self._finished = False # Indica si la fuente ya no entrega frames
+        self._droppedFrames = 0 # Frames descartados sin llegar al consumidor
+        self._deliveredFrames = 0 # Frames entregados al consumidor
+        self._thread = threading.Thread(target=self._run, name='ThreadedCapture', daemon=True)
+        self._thread.start() # Iniciar el hilo productor
+
+    @property
+    def droppedFrames(self):
+        return self._droppedFrames # Número de frames descartados
+
+    @property
+    def deliveredFrames(self):
+        return self._deliveredFrames # Número de frames entregados
+
+    @property
+    def failedGrabs(self):
+        return self._failedGrabs # Fallos de la fuente que se reintentaron
+
+    @property
+    def timestamp(self): # Momento de captura del frame reservado por grab()
+        return self._timestamps[self._held] if self._held is not None else None
+
+    def grab(self): # Tomar el frame más reciente del anillo
+        with self._condition:
+            if self._held is not None: # Devolver al anillo el frame del ciclo anterior
+                self._free.append(self._held)
+                self._held = None
+                self._condition.notify_all()
+            deadline = time.monotonic() + self._timeout # Límite de espera
+            while not self._ready and not self._finished: # Esperar un frame nuevo
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return False # No llegó ningún frame a tiempo
+                self._condition.wait(remaining)
+            if not self._ready: # La fuente terminó y no quedan frames
+                return False
+            if self._dropPolicy == ThreadedCapture.DROP_OLDEST: # Quedarse solo con el más reciente
+                while len(self._ready) > 1:
+                    self._free.append(self._ready.popleft())
+                    self._droppedFrames += 1
+                self._condition.notify_all()
+            self._held = self._ready.popleft() # Reservar el frame para el consumidor
+            self._deliveredFrames += 1
+            return True
+
+    def retrieve(self, image=None, flag=None): # Devolver el frame reservado por grab()
+        if self._held is None:
+            return False, None
+        return True, self._slots[self._held] # Vista del frame preasignado, sin copia
+
+    def read(self): # Equivalente a grab() seguido de retrieve()
+        if not self.grab():
+            return False, None
+        return self.retrieve()
+
+    def get(self, propId): # Delegar la consulta de propiedades a la captura
+        return self._capture.get(propId)
+
+    def set(self, propId, value): # Delegar la configuración de propiedades a la captura
+        return self._capture.set(propId, value)
+
+    def isOpened(self): # Indica si la captura subyacente está abierta
+        return self._capture.isOpened()
+
+    def release(self): # Detener el hilo productor y liberar la captura
+        with self._condition:
+            self._stopped = True
+            self._condition.notify_all()
+        self._thread.join()
+        self._capture.release()
+
+    def _acquireSlot(self): # Obtener un índice libre para escribir (productor)
+        with self._condition:
+            while not self._free:
+                if self._stopped:
+                    return None
+                if self._dropPolicy == ThreadedCapture.DROP_OLDEST and self._ready:
+                    self._droppedFrames += 1 # Reutilizar el frame listo más antiguo
+                    return self._ready.popleft()
+                self._condition.wait()
+            return None if self._stopped else self._free.popleft()
+
+    def _run(self): # Bucle del hilo productor
+        while not self._stopped:
+            if not self._capture.grab(): # Fallo puntual, fuente cerrada o fin del archivo
+                if not self._capture.isOpened() or self._isAtEnd():
+                    break
+                self._failedGrabs += 1
+                with self._condition: # Reintentar tras una pausa corta (despierta si se pide detener)
+                    self._condition.wait_for(lambda: self._stopped, self._retryInterval)
+                continue
+            timestamp = time.monotonic() # Momento de captura
+            index = self._acquireSlot()
+            if index is None: # Se pidió detener el hilo
+                break
+            ok, image = self._capture.retrieve(self._slots[index]) # Decodificar en el frame preasignado
+            with self._condition:
+                if not ok:
+                    self._free.append(index)
+                    continue
+                if image is not self._slots[index]: # Primer frame o cambio de tamaño
+                    self._slots[index] = image
+                    self._slots = [numpy.empty_like(image) if slot is None else slot
+                                   for slot in self._slots] # Preasignar el resto del anillo
+                self._timestamps[index] = timestamp
+                self._ready.append(index) # Publicar el frame
+                self._condition.notify_all()
+        with self._condition:
+            self._finished = True
+            self._condition.notify_all()
+
+    def _isAtEnd(self): # Indica si la fuente es un archivo que ya entregó todos sus frames
+        frameCount = self._capture.get(cv2.CAP_PROP_FRAME_COUNT)
+        return frameCount > 0 and self._capture.get(cv2.CAP_PROP_POS_FRAMES) >= frameCount
+
+class SyntheticCapture(object): # Fuente de video sintética y determinista (sin cámara)
+    """Imita cv2.VideoCapture generando frames reproducibles.
+
+    Útil para pruebas y benchmarks: cada frame es un patrón suave con bordes
+    que se desplaza un poco en cada frame. frameCount=None no termina nunca.
+    Con realTime=True grab() espera para entregar frames a fps, como una cámara.
+    """
+    def __init__(self, width=640, height=480, fps=30.0, frameCount=None, seed=0, realTime=False): # Inicializador con tamaño, FPS y semilla
+        self._fps = fps # FPS que informa get(CAP_PROP_FPS)
+        self._frameCount = frameCount # Número de frames a entregar (None: infinito)
+        self._frameIndex = -1 # Índice del último frame tomado con grab()
+        self._isOpened = True # Indica si la fuente está abierta
+        self._pattern = createSyntheticFrame(width, height, seed) # Patrón base
+        self._pacer = FramePacer(fps) if realTime else None # Entregar frames al ritmo de fps
+
+    def grab(self): # Avanzar al siguiente frame
+        if not self._isOpened or (self._frameCount is not None and self._frameIndex + 1 >= self._frameCount):
+            return False
+        if self._pacer is not None: # Esperar al próximo frame como lo haría una cámara
+            self._pacer.wait()
+        self._frameIndex += 1
+        return True
+
+    def retrieve(self, image=None, flag=None): # Generar el frame actual (en image si tiene la forma correcta)
+        if self._frameIndex < 0:
+            return False, None
+        if image is None or image.shape != self._pattern.shape or image.dtype != self._pattern.dtype:
+            image = numpy.empty_like(self._pattern)
+        shift = (self._frameIndex * 4) % self._pattern.shape[1] # Desplazamiento horizontal del patrón
+        image[:, :self._pattern.shape[1] - shift] = self._pattern[:, shift:]
+        image[:, self._pattern.shape[1] - shift:] = self._pattern[:, :shift]
+        return True, image
+
+    def read(self, image=None): # Equivalente a grab() seguido de retrieve()
+        if not self.grab():
+            return False, None
+        return self.retrieve(image)
+
+    def get(self, propId): # Propiedades básicas de una captura
+        if propId == cv2.CAP_PROP_FPS:
+            return self._fps
+        if propId == cv2.CAP_PROP_FRAME_WIDTH:
+            return float(self._pattern.shape[1])
+        if propId == cv2.CAP_PROP_FRAME_HEIGHT:
+            return float(self._pattern.shape[0])
+        if propId == cv2.CAP_PROP_FRAME_COUNT:
+            return float(self._frameCount or 0)
+        if propId == cv2.CAP_PROP_POS_FRAMES:
+            return float(self._frameIndex + 1)
+        return 0.0
+
+    def set(self, propId, value): # Solo admite reposicionar el frame
+        if propId == cv2.CAP_PROP_POS_FRAMES:
+            self._frameIndex = int(value) - 1
+            return True
+        return False
+
+    def isOpened(self):
+        return self._isOpened
+
+    def release(self):
+        self._isOpened = False
+
+class FramePacer(object): # Espera entre frames para entregarlos a un ritmo fijo
+    def __init__(self, fps): # Inicializador con los FPS a respetar
+        self._interval = 1.0 / fps if fps and fps > 0 else 0.0 # Segundos entre frames (0: sin espera)
+        self._nextFrameTime = None # Momento del próximo frame
+
+    def wait(self): # Dormir hasta el momento del próximo frame
+        now = time.monotonic()
+        if self._nextFrameTime is None or now - self._nextFrameTime > 1.0: # Primer frame o tras una pausa
+            self._nextFrameTime = now
+        elif now < self._nextFrameTime:
+            time.sleep(self._nextFrameTime - now)
+        self._nextFrameTime += self._interval
+
+class PacedCapture(object): # Captura de archivo que entrega frames a sus FPS, como una cámara
+    """Envuelve un cv2.VideoCapture de archivo para que grab() no corra más que CAP_PROP_FPS.
+
+    Sin esto el hilo de ThreadedCapture decodifica el archivo tan rápido como
+    puede y descarta casi todos los frames antes de que se procesen.
+    """
+    def __init__(self, capture, fps=None): # Inicializador con la captura y los FPS (None: los del archivo)
+        self._capture = capture # Captura subyacente
+        self._pacer = FramePacer(fps or capture.get(cv2.CAP_PROP_FPS) or 30.0) # Ritmo de entrega
+
+    def grab(self): # Esperar al momento del frame y tomarlo
+        self._pacer.wait()
+        return self._capture.grab()
+
+    def retrieve(self, image=None, flag=None): # Delegar la decodificación
+        return self._capture.retrieve(image)
+
+    def read(self, image=None): # Equivalente a grab() seguido de retrieve()
+        if not self.grab():
+            return False, None
+        return self.retrieve(image)
+
+    def get(self, propId):
+        return self._capture.get(propId)
+
+    def set(self, propId, value):
+        return self._capture.set(propId, value)
+
+    def isOpened(self):
+        return self._capture.isOpened()
+
+    def release(self):
+        self._capture.release()
+
+def createSyntheticFrame(width, height, seed=0): # Frame BGR reproducible con zonas suaves y bordes
+    rng = numpy.random.default_rng(seed)
+    coarse = rng.integers(0, 256, (max(2, height // 40), max(2, width // 40), 3), dtype=numpy.uint8) # Manchas de color
+    frame = cv2.resize(coarse, (width, height), interpolation=cv2.INTER_CUBIC)
+    for _ in range(12): # Rectángulos y círculos para tener bordes nítidos
+        color = tuple(int(c) for c in rng.integers(0, 256, 3))
+        x, y = int(rng.integers(0, width)), int(rng.integers(0, height))
+        size = int(rng.integers(max(2, min(width, height) // 20), max(3, min(width, height) // 4)))
+        if rng.random() < 0.5:
+            cv2.rectangle(frame, (x, y), (x + size, y + size), color, -1)
+        else:
+            cv2.circle(frame, (x, y), size // 2, color, -1)
+    noise = rng.integers(-8, 9, frame.shape, dtype=numpy.int16) # Ruido leve de sensor
+    return numpy.clip(frame.astype(numpy.int16) + noise, 0, 255).astype(numpy.uint8)
 
 class CaptureManager(object): # Clase para gestionar la captura de video
-    def __init__(self, capture, previewWindowManager=None, shouldMirrorPreview=False): # Inicializador de la clase CaptureManager
+    def __init__(self, capture, previewWindowManager=None, shouldMirrorPreview=False,
+                 threaded=False, ringSize=3, dropPolicy=ThreadedCapture.DROP_OLDEST,
+                 writerQueueSize=8, writerOverflowPolicy=writers.AsyncWriter.DROP, stageTimer=None,
+                 preRollSeconds=0.0, preRollBytes=64 * 1024 * 1024): # Inicializador de la clase CaptureManager
         self.previewWindowManager = previewWindowManager # Ventana de previsualización
         self.shouldMirrorPreview = shouldMirrorPreview # Indica si se debe espejar la previsualización
+        if threaded and capture is not None: # Capturar en un hilo productor
+            capture = ThreadedCapture(capture, ringSize, dropPolicy)
         self._capture = capture # Objeto de captura de video
         self._channel = 0 # Canal de captura (0 por defecto)
         self._enteredFrame = False # Indica si se ha entrado en un frame
         self._frame = None # Frame actual
+        self._frameTimestamp = None # Momento de captura del frame actual (time.monotonic)
         self._imageFilename = None # Nombre del archivo para guardar imagen
         self._videoFilename = None # Nombre del archivo para guardar video
         self._videoEncoding = None # Codificación de video
-        self._videoWriter = None # Objeto de escritura de video
+        self._videoWriter = None # Objeto de escritura de video (asíncrono)
+        self._videoSegmentSeconds = None # Duración máxima de cada segmento de video
+        self._videoSegmentBytes = None # Tamaño máximo de cada segmento de video
+        self._preRoll = None # Últimos segundos comprimidos en memoria (opcional)
+        if preRollSeconds > 0:
+            self._preRoll = writers.PreRollBuffer(preRollSeconds, preRollBytes)
+        self._imageWriter = None # Escritor asíncrono de imágenes (se crea al primer uso)
+        self._writerQueueSize = writerQueueSize # Buffers en vuelo del escritor de video
+        self._writerOverflowPolicy = writerOverflowPolicy # Descartar o esperar si el disco no da abasto
         self._startTime = None  # Tiempo de inicio de la captura
         self._framesElapsed = 0 # Número de frames capturados
         self._fpsEstimate = None # Estimación de FPS
+        self._stageTimer = stageTimer # Medición de latencia por etapa (opcional)
+        self._frameSinks = [] # Destinos que reciben cada frame procesado (método publish)
+        self._mirrorBuffer = None # Buffer reutilizable para el frame espejado
 
     # Getter y setter para el canal de captura
     @property 
@@ -29,16 +320,50 @@ class CaptureManager(object): # Clase para gestionar la captura de video
             self._channel = value # Actualizar el canal
             self._frame = None # Resetear el frame actual
 
+    @property
+    def droppedFrames(self): # Frames descartados por el hilo de captura
+        if isinstance(self._capture, ThreadedCapture):
+            return self._capture.droppedFrames
+        return 0
+
+    @property
+    def deliveredFrames(self): # Frames entregados al bucle principal
+        if isinstance(self._capture, ThreadedCapture):
+            return self._capture.deliveredFrames
+        return self._framesElapsed
+
+    @property
+    def isWritingVideo(self): # Indica si hay una grabación de video en curso
+        return self._videoFilename is not None
+
+    @property
+    def videoWriter(self): # Escritor de video activo (expone profundidad de cola y latencias)
+        return self._videoWriter
+
+    @property
+    def preRoll(self): # Anillo de pre-roll (None si está desactivado)
+        return self._preRoll
+
+    @property
+    def frameTimestamp(self): # Momento de captura del frame actual
+        return self._frameTimestamp
+
     @property 
     def frame(self): 
         if self._enteredFrame and self._frame is None: # Si se ha entrado en un frame y no hay frame actual
             _, self._frame = self._capture.retrieve() # Recuperar el frame
+            self._lap('retrieve')
         return self._frame # Devolver el frame actual
 
     def enterFrame(self): # Entrar en un nuevo frame
         assert not self._enteredFrame # Asegurarse de que no se ha entrado ya en un frame
         if self._capture is not None: # Si el objeto de captura no es None
             self._enteredFrame = self._capture.grab() # Capturar un nuevo frame
+            if isinstance(self._capture, ThreadedCapture): # Momento real de captura
+                self._frameTimestamp = self._capture.timestamp
+            else:
+                self._frameTimestamp = time.monotonic()
+            self._lap('grab')
 
     def exitFrame(self): # Salir del frame actual
         if self.frame is None: # Si no hay frame actual
@@ -51,31 +376,79 @@ class CaptureManager(object): # Clase para gestionar la captura de video
             self._fpsEstimate = self._framesElapsed / timeElapsed # Estimación de FPS
         self._framesElapsed += 1 # Incrementar el contador de frames
 
+        if self._frameSinks: # Publicar el frame procesado (sin espejar)
+            for frameSink in self._frameSinks:
+                frameSink.publish(self._frame)
+            self._lap('publish')
+
         if self.previewWindowManager is not None: # Si hay una ventana de previsualización
+            previewFrame = self._frame # Frame normal
             if self.shouldMirrorPreview: # Si se debe espejar la previsualización
-                mirroredFrame = numpy.fliplr(self._frame).copy() # Espejar el frame
-                self.previewWindowManager.show(mirroredFrame) # Mostrar el frame espejado
-            else: # Si no se debe espejar la previsualización
-                self.previewWindowManager.show(self._frame) # Mostrar el frame normal
+                if self._mirrorBuffer is None or self._mirrorBuffer.shape != self._frame.shape:
+                    self._mirrorBuffer = numpy.empty_like(self._frame)
+                previewFrame = cv2.flip(self._frame, 1, self._mirrorBuffer) # Espejar en el buffer reutilizable
+                self._lap('mirror')
+            if self._stageTimer is not None and self._stageTimer.showOverlay: # Resumen de latencias
+                if previewFrame is self._frame: # No dibujar sobre el frame que se graba o publica
+                    previewFrame = self._frame.copy()
+                self._stageTimer.drawOverlay(previewFrame)
+            self.previewWindowManager.show(previewFrame) # Mostrar el frame
+            self._lap('show')
 
         if self._imageFilename: # Si hay un nombre de archivo para guardar imagen
-            cv2.imwrite(self._imageFilename, self._frame) # Guardar la imagen
+            if self._imageWriter is None: # Crear el escritor de imágenes al primer uso
+                self._imageWriter = writers.AsyncImageWriter()
+            self._imageWriter.write(self._imageFilename, self._frame) # Guardar la imagen en segundo plano
             self._imageFilename = None # Resetear el nombre del archivo
+            self._lap('imageWrite')
 
         if self._videoFilename: # Si hay un nombre de archivo para guardar video
             self._writeVideoFrame() # Escribir el frame en el video
+            self._lap('videoWrite')
+        elif self._preRoll is not None: # Sin grabación: guardar el frame en el pre-roll
+            self._preRoll.add(self._frame, self._frameTimestamp)
+            self._lap('preRoll')
 
         self._frame = None # Resetear el frame actual
         self._enteredFrame = False # Salir del frame
 
+    def discardFrame(self): # Salir del frame actual sin mostrarlo, publicarlo ni grabarlo
+        self._frame = None # Resetear el frame actual
+        self._enteredFrame = False # Salir del frame
+
+    def addFrameSink(self, frameSink): # Agregar un destino con método publish(frame)
+        self._frameSinks.append(frameSink)
+
+    def removeFrameSink(self, frameSink): # Quitar un destino
+        self._frameSinks.remove(frameSink)
+
+    def _lap(self, stage): # Registrar el tiempo de una etapa si hay medición
+        if self._stageTimer is not None:
+            self._stageTimer.lap(stage)
+
+    def release(self): # Liberar la captura (y detener el hilo de captura si existe)
+        self.stopWritingVideo() # Terminar la grabación pendiente
+        if self._preRoll is not None: # Detener el hilo del pre-roll
+            self._preRoll.close()
+        if self._imageWriter is not None: # Escribir las capturas pendientes
+            self._imageWriter.close()
+            self._imageWriter = None
+        if self._capture is not None:
+            self._capture.release()
+
     def writeImage(self, filename): # Guardar la imagen actual en un archivo
         self._imageFilename = filename # Establecer el nombre del archivo
 
-    def startWritingVideo(self, filename, encoding=cv2.VideoWriter_fourcc('I', '4', '2', '0')): # Iniciar la grabación de video
+    def startWritingVideo(self, filename, encoding=cv2.VideoWriter_fourcc('M', 'J', 'P', 'G'),
+                          segmentSeconds=None, segmentBytes=None): # Iniciar la grabación de video
         self._videoFilename = filename # Establecer el nombre del archivo
         self._videoEncoding = encoding # Establecer la codificación de video
+        self._videoSegmentSeconds = segmentSeconds # Rotar el archivo cada tantos segundos (None: no rotar)
+        self._videoSegmentBytes = segmentBytes # Rotar el archivo al llegar a tantos bytes (None: no rotar)
 
     def stopWritingVideo(self): # Detener la grabación de video
+        if self._videoWriter is not None: # Escribir los frames pendientes y cerrar el archivo
+            self._videoWriter.release()
         self._videoFilename = None # Resetear el nombre del archivo
         self._videoEncoding = None # Resetear la codificación de video
         self._videoWriter = None # Resetear el objeto de escritura de video
@@ -84,17 +457,242 @@ class CaptureManager(object): # Clase para gestionar la captura de video
         if not self._videoFilename: # Si no hay nombre de archivo,
             return
         if self._videoWriter is None: # Si el objeto de escritura de video no está inicializado
-            fps = self._capture.get(cv2.CAP_PROP_FPS) # Obtener los FPS del objeto de captura
-            if fps == 0.0: # Si no se pueden obtener los FPS
-                if self._framesElapsed < 20: # Si hay pocos frames capturados
-                    return # No hacer nada
-                fps = self._fpsEstimate # Usar la estimación de FPS
-            size = (int(self._capture.get(cv2.CAP_PROP_FRAME_WIDTH)), # Obteniendo el ancho del frame
-                    int(self._capture.get(cv2.CAP_PROP_FRAME_HEIGHT))) # Obteniendo el alto del frame
-             # Crear el objeto de escritura de video
-            self._videoWriter = cv2.VideoWriter(
-                self._videoFilename, self._videoEncoding, fps, size)
-        self._videoWriter.write(self._frame) # Escribir el frame en el archivo de video
+            fps = self._capture.get(cv2.CAP_PROP_FPS) # FPS nominales del contenedor
+            if not fps or fps <= 0: # La cámara no los informa: las marcas de tiempo corrigen el ritmo
+                fps = 30.0
+             # Crear el objeto de escritura de video (el tamaño se toma del primer frame)
+            self._videoWriter = writers.SegmentedVideoWriter(
+                self._videoFilename, self._videoEncoding, fps,
+                self._videoSegmentSeconds, self._videoSegmentBytes,
+                queueSize=self._writerQueueSize, overflowPolicy=self._writerOverflowPolicy)
+            if self._preRoll is not None: # Volcar primero los segundos anteriores
+                for timestamp, data in self._preRoll.drain():
+                    self._videoWriter.writeEncoded(data, timestamp)
+        self._videoWriter.write(self._frame, self._frameTimestamp) # Encolar el frame para escribirlo en segundo plano
+
+def openSource(source): # Abrir una fuente: índice de cámara, ruta de archivo (a sus FPS) o 'synthetic[:ANCHOxALTO]'
+    if isinstance(source, int):
+        return cv2.VideoCapture(source)
+    if isinstance(source, str) and source.startswith('synthetic'):
+        width, height = 640, 480
+        if ':' in source:
+            width, height = (int(value) for value in source.split(':', 1)[1].split('x'))
+        return SyntheticCapture(width, height, realTime=True)
+    if isinstance(source, str) and source.isdigit(): # Índice escrito como texto (línea de comandos)
+        return cv2.VideoCapture(int(source))
+    return PacedCapture(cv2.VideoCapture(source)) # Archivo: reproducir a sus FPS
+
+class CaptureSource(object): # Una fuente de MultiSourceCaptureManager con sus contadores
+    def __init__(self, index, name, capture): # Inicializador con el índice, nombre y captura en hilo aparte
+        self.index = index # Posición de la fuente
+        self.name = name # Nombre para mostrar
+        self.label = '' # Texto adicional del resumen (p. ej. el filtro activo)
+        self._capture = capture # ThreadedCapture de la fuente
+        self._future = None # Trabajo en curso en el grupo de hilos (como mucho uno)
+        self._frame = None # Frame del trabajo en curso
+        self._processTime = 0.0 # Segundos de proceso del último frame
+        self._timestamp = None # Momento de captura del frame del trabajo en curso
+        self._processedFrames = 0 # Frames procesados
+        self._intervals = collections.deque(maxlen=30) # Momentos de los últimos frames procesados
+
+    @property
+    def processedFrames(self):
+        return self._processedFrames # Frames procesados
+
+    @property
+    def droppedFrames(self):
+        return self._capture.droppedFrames # Frames que la cámara entregó pero no se llegaron a procesar
+
+    @property
+    def fps(self): # FPS procesados en los últimos frames
+        if len(self._intervals) < 2:
+            return 0.0
+        elapsed = self._intervals[-1] - self._intervals[0]
+        return (len(self._intervals) - 1) / elapsed if elapsed > 0 else 0.0
+
+class MultiSourceCaptureManager(object): # Captura de varias fuentes procesadas por un grupo de hilos compartido
+    """Captura N fuentes, cada una en su hilo, y las procesa en un solo grupo de hilos.
+
+    processFrame(índice, frame) se llama en un hilo del grupo y modifica el
+    frame en su lugar, así que los filtros (y sus tablas) se comparten entre
+    fuentes. Cada fuente tiene como mucho un trabajo en curso y las fuentes
+    se atienden por turnos empezando después de la última servida, así que
+    una fuente lenta ocupa como mucho un hilo y no deja sin turno a las
+    demás. Con MOSAIC los resultados se componen en un mosaico que se
+    muestra en la primera ventana; con SEPARATE cada fuente se muestra en su
+    propia ventana. El mosaico se publica a los destinos generales y es lo
+    que se graba; cada fuente puede tener además sus propios destinos.
+    """
+
+    MOSAIC = 'mosaic' # Un solo frame con todas las fuentes
+    SEPARATE = 'separate' # Una ventana por fuente
+
+    def __init__(self, sources, processFrame=None, workers=None, layout=MOSAIC, previewWindowManagers=(),
+                 cellSize=(640, 480), ringSize=3, showStats=True, stageTimer=None): # Inicializador con las fuentes y la función de proceso
+        if layout not in (MultiSourceCaptureManager.MOSAIC, MultiSourceCaptureManager.SEPARATE):
+            raise ValueError(f"Disposición desconocida: {layout}")
+        self._sources = [CaptureSource(index, str(source), ThreadedCapture(openSource(source), ringSize, timeout=0.0))
+                         for index, source in enumerate(sources)] # Fuentes con captura en hilo aparte
+        self._processFrame = processFrame # Función (índice, frame) que procesa en su lugar
+        self._workers = workers or min(len(self._sources), os.cpu_count() or 1) # Hilos del grupo
+        self._pool = concurrent.futures.ThreadPoolExecutor(self._workers, thread_name_prefix='MultiSource')
+        self._layout = layout # Mosaico o ventanas separadas
+        self._previewWindowManagers = list(previewWindowManagers) # Ventanas de previsualización
+        self._cellSize = cellSize # Tamaño de cada celda del mosaico (ancho, alto)
+        self.showStats = showStats # Dibujar nombre, FPS y frames perdidos en cada celda
+        self._columns = math.ceil(math.sqrt(len(self._sources))) # Columnas del mosaico
+        rows = math.ceil(len(self._sources) / self._columns)
+        self._mosaic = numpy.zeros((rows * cellSize[1], self._columns * cellSize[0], 3), numpy.uint8) # Mosaico
+        self._nextSource = 0 # Fuente por la que empieza el próximo turno
+        self._inFlight = 0 # Trabajos en curso
+        self._frameSinks = [] # Destinos del mosaico
+        self._sourceSinks = [[] for _ in self._sources] # Destinos de cada fuente
+        self._imageFilename = None # Captura pendiente del mosaico
+        self._imageWriter = None # Escritor asíncrono de imágenes (se crea al primer uso)
+        self._videoFilename = None # Grabación del mosaico
+        self._videoEncoding = None # Codificación de video
+        self._videoSegmentSeconds = None # Duración máxima de cada segmento
+        self._videoSegmentBytes = None # Tamaño máximo de cada segmento
+        self._videoWriter = None # Escritor de video por segmentos
+        self._stageTimer = stageTimer # Medición de latencia (etapa sourceN por fuente, opcional)
+
+    @property
+    def sources(self):
+        return list(self._sources) # Fuentes con sus contadores
+
+    @property
+    def mosaic(self):
+        return self._mosaic # Último mosaico compuesto
+
+    @property
+    def isWritingVideo(self): # Indica si hay una grabación de video en curso
+        return self._videoFilename is not None
+
+    def addFrameSink(self, frameSink, sourceIndex=None): # Agregar un destino del mosaico o de una fuente
+        (self._frameSinks if sourceIndex is None else self._sourceSinks[sourceIndex]).append(frameSink)
+
+    def removeFrameSink(self, frameSink, sourceIndex=None): # Quitar un destino
+        (self._frameSinks if sourceIndex is None else self._sourceSinks[sourceIndex]).remove(frameSink)
+
+    def update(self, timeout=0.005): # Repartir frames nuevos, recoger los terminados y mostrarlos
+        """Devuelve el número de fuentes actualizadas. Espera como mucho timeout
+        segundos a que termine algún trabajo."""
+        self._dispatch()
+        pending = [source._future for source in self._sources if source._future is not None]
+        if pending:
+            concurrent.futures.wait(pending, timeout, concurrent.futures.FIRST_COMPLETED)
+        updated = self._collect()
+        if self._stageTimer is not None: # No contar la espera como parte de una etapa
+            self._stageTimer.mark()
+        if updated:
+            self._publish(updated)
+            if self._stageTimer is not None:
+                self._stageTimer.lap('show')
+        self._dispatch() # Volver a ocupar los hilos que se liberaron
+        return len(updated)
+
+    def release(self): # Esperar los trabajos, detener el grupo y liberar las capturas
+        self._pool.shutdown()
+        self.stopWritingVideo()
+        if self._imageWriter is not None:
+            self._imageWriter.close()
+            self._imageWriter = None
+        for source in self._sources:
+            source._capture.release()
+
+    def writeImage(self, filename): # Guardar el próximo mosaico en un archivo
+        self._imageFilename = filename
+
+    def startWritingVideo(self, filename, encoding=cv2.VideoWriter_fourcc('M', 'J', 'P', 'G'),
+                          segmentSeconds=None, segmentBytes=None): # Grabar el mosaico
+        self._videoFilename = filename
+        self._videoEncoding = encoding
+        self._videoSegmentSeconds = segmentSeconds
+        self._videoSegmentBytes = segmentBytes
+
+    def stopWritingVideo(self): # Detener la grabación
+        if self._videoWriter is not None:
+            self._videoWriter.release()
+        self._videoFilename = None
+        self._videoEncoding = None
+        self._videoWriter = None
+
+    def _dispatch(self): # Enviar al grupo un frame nuevo de cada fuente libre, por turnos
+        count = len(self._sources)
+        for offset in range(count):
+            if self._inFlight >= self._workers: # Todos los hilos ocupados: el turno sigue donde quedó
+                break
+            source = self._sources[(self._nextSource + offset) % count]
+            if source._future is not None or not source._capture.grab(): # Ocupada o sin frame nuevo
+                continue
+            _, source._frame = source._capture.retrieve()
+            source._timestamp = source._capture.timestamp
+            source._future = self._pool.submit(self._run, source)
+            self._inFlight += 1
+            self._nextSource = (source.index + 1) % count # La siguiente ronda empieza después de esta fuente
+
+    def _run(self, source): # Procesar el frame de una fuente (en un hilo del grupo)
+        startTime = time.perf_counter()
+        if self._processFrame is not None:
+            self._processFrame(source.index, source._frame)
+        source._processTime = time.perf_counter() - startTime
+
+    def _withOverlay(self, frame): # Copia con el resumen de latencias si está activado (la ventana principal)
+        if self._stageTimer is None or not self._stageTimer.showOverlay:
+            return frame
+        frame = frame.copy() # No dibujar sobre lo que se graba o publica
+        self._stageTimer.drawOverlay(frame)
+        return frame
+
+    def _collect(self): # Recoger los trabajos terminados
+        updated = []
+        for source in self._sources:
+            if source._future is None or not source._future.done():
+                continue
+            future, source._future = source._future, None
+            self._inFlight -= 1
+            future.result() # Propagar excepciones
+            source._processedFrames += 1
+            source._intervals.append(time.monotonic())
+            if self._stageTimer is not None: # Tiempo de proceso de la fuente en el grupo de hilos
+                self._stageTimer.record(f"source{source.index}", source._processTime)
+            updated.append(source)
+        return updated
+
+    def _publish(self, updated): # Componer el mosaico, mostrar, publicar y escribir
+        cellWidth, cellHeight = self._cellSize
+        for source in updated: # El frame sigue reservado hasta el próximo grab() de su fuente
+            for frameSink in self._sourceSinks[source.index]:
+                frameSink.publish(source._frame)
+            if self._layout == MultiSourceCaptureManager.SEPARATE and source.index < len(self._previewWindowManagers):
+                self._previewWindowManagers[source.index].show(
+                    self._withOverlay(source._frame) if source.index == 0 else source._frame)
+            row, column = divmod(source.index, self._columns)
+            cell = self._mosaic[row * cellHeight:(row + 1) * cellHeight, column * cellWidth:(column + 1) * cellWidth]
+            frame = source._frame if source._frame.ndim == 3 else cv2.cvtColor(source._frame, cv2.COLOR_GRAY2BGR)
+            if frame.shape[:2] == cell.shape[:2]:
+                cell[...] = frame
+            else:
+                cv2.resize(frame, (cellWidth, cellHeight), cell, interpolation=cv2.INTER_AREA)
+            if self.showStats: # Nombre, FPS y frames perdidos de la fuente
+                text = f"{source.index}: {source.name} {source.label} {source.fps:.1f} fps, {source.droppedFrames} perdidos"
+                cv2.putText(cell, text, (8, cellHeight - 10), cv2.FONT_HERSHEY_PLAIN, 1.0, (0, 0, 0), 3)
+                cv2.putText(cell, text, (8, cellHeight - 10), cv2.FONT_HERSHEY_PLAIN, 1.0, (255, 255, 255), 1)
+        for frameSink in self._frameSinks:
+            frameSink.publish(self._mosaic)
+        if self._layout == MultiSourceCaptureManager.MOSAIC and self._previewWindowManagers:
+            self._previewWindowManagers[0].show(self._withOverlay(self._mosaic))
+        if self._imageFilename: # Captura del mosaico en segundo plano
+            if self._imageWriter is None:
+                self._imageWriter = writers.AsyncImageWriter()
+            self._imageWriter.write(self._imageFilename, self._mosaic)
+            self._imageFilename = None
+        if self._videoFilename: # Grabación del mosaico con marcas de tiempo reales
+            if self._videoWriter is None:
+                self._videoWriter = writers.SegmentedVideoWriter(
+                    self._videoFilename, self._videoEncoding, 30.0,
+                    self._videoSegmentSeconds, self._videoSegmentBytes)
+            self._videoWriter.write(self._mosaic, max(source._timestamp for source in updated))
 
 class WindowManager(object): # Clase para gestionar la ventana de visualización
     def __init__(self, windowName, keypressCallback=None): # Inicializador de la clase WindowManager
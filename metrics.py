@@ -0,0 +1,150 @@
+import os
+import tempfile
+import time
+
+import cv2
+import numpy
+
+class RollingHistogram(object): # Muestras de los últimos N frames en un anillo de tamaño fijo
+    def __init__(self, size=300): # Inicializador con el número de muestras a conservar
+        self._samples = numpy.zeros(size) # Anillo de muestras en segundos
+        self._index = 0 # Próxima posición a escribir
+        self._count = 0 # Total de muestras registradas desde el inicio
+        self._sum = 0.0 # Suma de todas las muestras registradas
+
+    @property
+    def count(self):
+        return self._count # Total de muestras registradas
+
+    @property
+    def sum(self):
+        return self._sum # Suma de todas las muestras registradas
+
+    def add(self, value): # Registrar una muestra
+        self._samples[self._index] = value
+        self._index = (self._index + 1) % len(self._samples)
+        self._count += 1
+        self._sum += value
+
+    def percentiles(self, quantiles=(50, 95, 99)): # Percentiles sobre las muestras del anillo
+        samples = self._samples[:min(self._count, len(self._samples))]
+        if len(samples) == 0:
+            return [0.0] * len(quantiles)
+        return list(numpy.percentile(samples, quantiles))
+
+class StageTimer(object): # Latencia por etapa del bucle principal
+    """Mide cada etapa del frame con perf_counter_ns y percentiles móviles.
+
+    beginFrame() marca el inicio del frame, lap(etapa) registra el tiempo
+    transcurrido desde la marca anterior y endFrame() registra el total.
+    Opcionalmente exporta cada exportInterval segundos a CSV y a un archivo
+    de texto en formato Prometheus, y dibuja un resumen sobre el frame.
+    """
+
+    STAGES = ('grab', 'retrieve', 'strokeEdges', 'filter', 'incremental', 'publish', 'mirror', 'show',
+              'imageWrite', 'videoWrite', 'preRoll', 'waitKey', 'frame') # Orden de presentación
+
+    def __init__(self, windowSize=300, csvPath=None, prometheusPath=None, exportInterval=5.0): # Inicializador
+        self.showOverlay = False # Dibujar el resumen sobre la previsualización
+        self._windowSize = windowSize # Frames que abarcan los percentiles
+        self._histograms = {} # Histograma por etapa
+        self._intervals = RollingHistogram(windowSize) # Tiempo entre inicios de frame, para los FPS
+        self._csvPath = csvPath # Archivo CSV de exportación (None: no exportar)
+        self._prometheusPath = prometheusPath # Archivo Prometheus de exportación (None: no exportar)
+        self._exportInterval = exportInterval # Segundos entre exportaciones
+        self._lastExport = time.monotonic() # Momento de la última exportación
+        self._frameStart = None # Inicio del frame actual (ns)
+        self._lastMark = None # Última marca (ns)
+        self._overlayLines = [] # Texto del resumen en pantalla
+        self._overlayUpdated = 0.0 # Momento de la última actualización del resumen
+
+    @property
+    def fps(self): # FPS actuales según la mediana del intervalo entre frames
+        median = self._intervals.percentiles((50,))[0]
+        return 1.0 / median if median > 0 else 0.0
+
+    def beginFrame(self): # Marcar el inicio de un frame
+        now = time.perf_counter_ns()
+        if self._frameStart is not None:
+            self._intervals.add((now - self._frameStart) * 1e-9)
+        self._frameStart = self._lastMark = now
+
+    def lap(self, stage): # Registrar el tiempo desde la marca anterior como la etapa dada
+        now = time.perf_counter_ns()
+        if self._lastMark is not None:
+            self.record(stage, (now - self._lastMark) * 1e-9)
+        self._lastMark = now
+
+    def mark(self): # Mover la marca sin registrar nada (saltar una sección no medida)
+        self._lastMark = time.perf_counter_ns()
+
+    def endFrame(self): # Registrar la duración total del frame y exportar si toca
+        if self._frameStart is not None:
+            self.record('frame', (time.perf_counter_ns() - self._frameStart) * 1e-9)
+        if (self._csvPath or self._prometheusPath) and time.monotonic() - self._lastExport >= self._exportInterval:
+            self.export()
+
+    def record(self, stage, seconds): # Registrar una muestra de una etapa
+        histogram = self._histograms.get(stage)
+        if histogram is None:
+            histogram = self._histograms[stage] = RollingHistogram(self._windowSize)
+        histogram.add(seconds)
+
+    def percentiles(self, stage, quantiles=(50, 95, 99)): # Percentiles de una etapa en milisegundos
+        histogram = self._histograms.get(stage)
+        if histogram is None:
+            return [0.0] * len(quantiles)
+        return [value * 1000 for value in histogram.percentiles(quantiles)]
+
+    def stages(self): # Etapas con muestras, en orden de presentación
+        known = [stage for stage in StageTimer.STAGES if stage in self._histograms]
+        return known + sorted(stage for stage in self._histograms if stage not in StageTimer.STAGES)
+
+    def drawOverlay(self, frame): # Dibujar p50/p95/p99 de cada etapa sobre el frame
+        now = time.monotonic()
+        if now - self._overlayUpdated >= 0.5: # Recalcular el texto dos veces por segundo
+            self._overlayLines = [f"{self.fps:5.1f} fps"] + [
+                "{:<11} {:6.1f} {:6.1f} {:6.1f} ms".format(stage, *self.percentiles(stage))
+                for stage in self.stages()]
+            self._overlayUpdated = now
+        for i, line in enumerate(self._overlayLines):
+            origin = (10, 20 + 18 * i)
+            cv2.putText(frame, line, origin, cv2.FONT_HERSHEY_PLAIN, 1.0, (0, 0, 0), 3) # Contorno
+            cv2.putText(frame, line, origin, cv2.FONT_HERSHEY_PLAIN, 1.0, (255, 255, 255), 1)
+
+    def export(self): # Exportar a los archivos configurados
+        self._lastExport = time.monotonic()
+        if self._csvPath:
+            self.exportCsv(self._csvPath)
+        if self._prometheusPath:
+            self.exportPrometheus(self._prometheusPath)
+
+    def exportCsv(self, path): # Agregar una fila por etapa al CSV
+        isNew = not os.path.exists(path)
+        timestamp = time.strftime('%Y-%m-%dT%H:%M:%S')
+        with open(path, 'a') as csvFile:
+            if isNew:
+                csvFile.write('timestamp,stage,count,p50_ms,p95_ms,p99_ms\n')
+            for stage in self.stages():
+                p50, p95, p99 = self.percentiles(stage)
+                csvFile.write(f"{timestamp},{stage},{self._histograms[stage].count},{p50:.3f},{p95:.3f},{p99:.3f}\n")
+
+    def exportPrometheus(self, path): # Escribir un archivo de texto en formato Prometheus (atómico)
+        lines = [
+            '# HELP cameo_stage_latency_seconds Latencia por etapa en los últimos frames.',
+            '# TYPE cameo_stage_latency_seconds summary']
+        for stage in self.stages():
+            histogram = self._histograms[stage]
+            for quantile, value in zip(('0.5', '0.95', '0.99'), histogram.percentiles((50, 95, 99))):
+                lines.append(f'cameo_stage_latency_seconds{{stage="{stage}",quantile="{quantile}"}} {value:.6f}')
+            lines.append(f'cameo_stage_latency_seconds_sum{{stage="{stage}"}} {histogram.sum:.6f}')
+            lines.append(f'cameo_stage_latency_seconds_count{{stage="{stage}"}} {histogram.count}')
+        lines += [
+            '# HELP cameo_fps Frames por segundo actuales.',
+            '# TYPE cameo_fps gauge',
+            f'cameo_fps {self.fps:.3f}']
+        directory = os.path.dirname(os.path.abspath(path))
+        fd, tempPath = tempfile.mkstemp(dir=directory, suffix='.tmp') # Escribir aparte y renombrar
+        with os.fdopen(fd, 'w') as tempFile:
+            tempFile.write('\n'.join(lines) + '\n')
+        os.replace(tempPath, path)
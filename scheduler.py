@@ -0,0 +1,117 @@
+import time
+
+class QualityLevel(object): # Ajustes de calidad de un nivel de degradación
+    def __init__(self, name, processScale=1.0, blurKsize=7, edgeKsize=5, strokeEdgesEvery=1, dropEvery=0): # Inicializador
+        self.name = name # Nombre para mostrar
+        self.processScale = processScale # Escala a la que se procesa el frame (se reescala al final)
+        self.blurKsize = blurKsize # Kernel del desenfoque mediano de strokeEdges
+        self.edgeKsize = edgeKsize # Kernel del Laplaciano de strokeEdges
+        self.strokeEdgesEvery = strokeEdgesEvery # Aplicar strokeEdges uno de cada N frames
+        self.dropEvery = dropEvery # Descartar uno de cada N frames (0: ninguno)
+
+DEFAULT_LEVELS = ( # De mejor a peor calidad
+    QualityLevel('full'),
+    QualityLevel('smallKernels', blurKsize=5, edgeKsize=3),
+    QualityLevel('halfResolution', processScale=0.5, blurKsize=5, edgeKsize=3),
+    QualityLevel('alternateEdges', processScale=0.5, blurKsize=5, edgeKsize=3, strokeEdgesEvery=2),
+    QualityLevel('dropFrames', processScale=0.5, blurKsize=3, edgeKsize=3, strokeEdgesEvery=2, dropEvery=2)
+)
+
+class FrameBudgetScheduler(object): # Ajusta la calidad para mantener los FPS objetivo
+    """Mide el tiempo de procesamiento de cada frame y elige un nivel de calidad.
+
+    El uso del presupuesto (tiempo / (1 / targetFps)) se suaviza con una
+    media exponencial. Si supera 1.0 durante degradeAfter frames seguidos se
+    baja un nivel; si queda por debajo de upgradeUsage durante upgradeAfter
+    frames se sube uno. Si al subir hay que volver a bajar enseguida, la
+    espera para volver a subir se duplica (hasta maxBackoff veces), para no
+    oscilar entre dos niveles.
+    """
+    def __init__(self, targetFps=30.0, levels=DEFAULT_LEVELS, degradeAfter=5, upgradeAfter=60,
+                 upgradeUsage=0.6, smoothing=0.2, maxBackoff=16): # Inicializador
+        self._budget = 1.0 / targetFps # Segundos disponibles por frame
+        self._levels = tuple(levels) # Niveles de mejor a peor calidad
+        self._degradeAfter = degradeAfter # Frames por encima del presupuesto antes de bajar
+        self._upgradeAfter = upgradeAfter # Frames con holgura antes de subir
+        self._upgradeUsage = upgradeUsage # Uso por debajo del cual hay holgura
+        self._smoothing = smoothing # Peso de cada muestra en la media exponencial
+        self._maxBackoff = maxBackoff # Multiplicador máximo de la espera para subir
+        self._level = 0 # Nivel actual
+        self._usage = 0.0 # Uso suavizado del presupuesto
+        self._overBudget = 0 # Frames seguidos por encima del presupuesto
+        self._underBudget = 0 # Frames seguidos con holgura
+        self._backoff = [1] * len(self._levels) # Multiplicador de la espera para subir desde cada nivel
+        self._framesAtLevel = 0 # Frames desde el último cambio de nivel
+        self._upgraded = False # El último cambio de nivel fue una subida
+        self._frameIndex = 0 # Frames vistos (procesados o descartados)
+        self._processedFrames = 0 # Frames procesados, para alternar strokeEdges entre ellos
+        self._startTime = None # Inicio del frame actual
+
+    @property
+    def level(self):
+        return self._level # Índice del nivel actual (0: calidad completa)
+
+    @property
+    def quality(self):
+        return self._levels[self._level] # Ajustes del nivel actual
+
+    @property
+    def budget(self):
+        return self._budget # Segundos por frame
+
+    @property
+    def budgetUsage(self):
+        return self._usage # Fracción del presupuesto usada (suavizada)
+
+    def shouldDropFrame(self): # Indica si el frame actual se debe descartar
+        dropEvery = self.quality.dropEvery
+        return dropEvery > 0 and self._frameIndex % dropEvery == dropEvery - 1
+
+    def shouldStrokeEdges(self): # Indica si en el frame actual se aplica strokeEdges
+        return self._processedFrames % self.quality.strokeEdgesEvery == 0 # Los descartados no cuentan
+
+    def beginFrame(self): # Empezar a medir el procesamiento del frame
+        self._startTime = time.perf_counter()
+        return self.quality
+
+    def skipFrame(self): # Avanzar sin medir (frame descartado)
+        self._startTime = None
+        self._frameIndex += 1
+
+    def endFrame(self): # Terminar la medición y ajustar el nivel; devuelve True si cambió
+        if self._startTime is None:
+            return False
+        usage = (time.perf_counter() - self._startTime) / self._budget
+        self._startTime = None
+        if self._framesAtLevel == 0: # Primer frame del nivel: no arrastrar la media del nivel anterior
+            self._usage = usage
+        else:
+            self._usage += self._smoothing * (usage - self._usage)
+        self._frameIndex += 1
+        self._processedFrames += 1
+        self._framesAtLevel += 1
+        if self._usage > 1.0: # Por encima del presupuesto
+            self._overBudget += 1
+            self._underBudget = 0
+            if self._overBudget >= self._degradeAfter and self._level < len(self._levels) - 1:
+                if self._upgraded and self._framesAtLevel < self._upgradeAfter: # Se acababa de subir: esperar más la próxima vez
+                    self._backoff[self._level + 1] = min(self._backoff[self._level + 1] * 2, self._maxBackoff)
+                self._setLevel(self._level + 1)
+                return True
+        elif self._usage < self._upgradeUsage: # Con holgura
+            self._underBudget += 1
+            self._overBudget = 0
+            if self._level > 0 and self._underBudget >= self._upgradeAfter * self._backoff[self._level]:
+                self._setLevel(self._level - 1)
+                return True
+        else: # Dentro de la banda de histéresis
+            self._overBudget = self._underBudget = 0
+        if self._framesAtLevel >= self._upgradeAfter * self._maxBackoff: # Nivel estable: olvidar la espera extra
+            self._backoff[self._level] = 1
+        return False
+
+    def _setLevel(self, level): # Cambiar de nivel y reiniciar los contadores
+        self._upgraded = level < self._level
+        self._level = level
+        self._overBudget = self._underBudget = 0
+        self._framesAtLevel = 0
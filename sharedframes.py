@@ -0,0 +1,177 @@
+import time
+from multiprocessing import resource_tracker, shared_memory
+
+import numpy
+
+_MAGIC = 0x43414D454F524E47 # 'CAMEORNG': identifica el formato del anillo
+_VERSION = 1 # Versión del formato
+_HEADER_BYTES = 64 # Cabecera: 7 enteros de 64 bits y el tipo de dato (8 bytes)
+_ALIGNMENT = 64 # Alineación de cada slot
+_ownedNames = set() # Segmentos creados por publicadores de este proceso
+
+# Índices de la cabecera
+_MAGIC_INDEX, _VERSION_INDEX, _SLOTS_INDEX, _ROWS_INDEX, _COLS_INDEX, _CHANNELS_INDEX, _LATEST_INDEX = range(7)
+
+class SharedFramePublisher(object): # Publica frames en un anillo de memoria compartida
+    """Escribe cada frame en el siguiente slot de un anillo de memoria compartida.
+
+    Cada slot tiene un número de secuencia (seqlock): impar mientras se
+    escribe y 2 * n cuando contiene el frame n. Los lectores comprueban la
+    secuencia antes y después de leer, sin bloqueos. La memoria se crea con
+    el primer frame; todos los frames deben tener la misma forma y tipo.
+    """
+    def __init__(self, name=None, slots=4): # Inicializador con el nombre del segmento y número de slots
+        self._name = name # Nombre del segmento (None: lo elige el sistema)
+        self._slots = max(2, slots) # Número de slots del anillo
+        self._memory = None # Segmento de memoria compartida
+        self._layout = None # Vistas numpy sobre la memoria
+        self._published = 0 # Frames publicados
+
+    @property
+    def name(self): # Nombre del segmento, para abrirlo con SharedFrameReader
+        return self._memory.name if self._memory is not None else self._name
+
+    @property
+    def publishedFrames(self):
+        return self._published # Frames publicados
+
+    def publish(self, frame): # Copiar un frame al siguiente slot
+        if self._memory is None:
+            self._create(frame)
+        header, sequences, timestamps, slots = self._layout
+        if frame.shape != slots.shape[1:] or frame.dtype != slots.dtype:
+            raise ValueError(f"El frame {frame.shape} {frame.dtype} no coincide con el anillo "
+                             f"{slots.shape[1:]} {slots.dtype}")
+        frameNumber = self._published + 1
+        slot = self._published % self._slots
+        sequences[slot] = 2 * frameNumber - 1 # Impar: escritura en curso
+        numpy.copyto(slots[slot], frame)
+        timestamps[slot] = time.time()
+        sequences[slot] = 2 * frameNumber # Par: frame completo
+        header[_LATEST_INDEX] = frameNumber # Anunciar el frame más reciente
+        self._published = frameNumber
+
+    def close(self, unlink=True): # Cerrar (y por defecto eliminar) el segmento
+        if self._memory is None:
+            return
+        self._layout = None
+        self._memory.close()
+        if unlink:
+            self._memory.unlink()
+            _ownedNames.discard(self._memory.name)
+        self._memory = None
+
+    def _create(self, frame): # Crear el segmento con la forma del primer frame
+        rows, cols = frame.shape[:2]
+        channels = frame.shape[2] if frame.ndim == 3 else 1
+        size = _HEADER_BYTES + _slotTableBytes(self._slots) + self._slots * _slotBytes(frame.nbytes)
+        self._memory = shared_memory.SharedMemory(self._name, create=True, size=size)
+        _ownedNames.add(self._memory.name)
+        self._layout = _mapLayout(self._memory.buf, self._slots, frame.shape, frame.dtype)
+        header = self._layout[0]
+        header[:_LATEST_INDEX + 1] = (_MAGIC, _VERSION, self._slots, rows, cols, channels, 0)
+        _dtypeField(self._memory.buf)[:] = numpy.frombuffer(frame.dtype.str.encode('ascii').ljust(8), numpy.uint8)
+
+class SharedFrameReader(object): # Lee frames publicados por SharedFramePublisher en otro proceso
+    def __init__(self, name): # Inicializador con el nombre del segmento
+        self._memory = _attach(name) # Segmento existente
+        magic, version, slots, rows, cols, channels = (int(value) for value in
+                                                      numpy.frombuffer(self._memory.buf, numpy.int64, 6))
+        if magic != _MAGIC or version != _VERSION:
+            self._memory.close()
+            raise ValueError(f"{name} no es un anillo de frames de Cameo")
+        dtype = numpy.dtype(bytes(_dtypeField(self._memory.buf)).rstrip().decode('ascii'))
+        shape = (rows, cols, channels) if channels > 1 else (rows, cols)
+        self._layout = _mapLayout(self._memory.buf, slots, shape, dtype)
+
+    @property
+    def shape(self):
+        return self._layout[3].shape[1:] # Forma de cada frame
+
+    @property
+    def dtype(self):
+        return self._layout[3].dtype # Tipo de dato de los frames
+
+    @property
+    def latestFrameNumber(self): # Número del último frame publicado (0: ninguno)
+        return int(self._layout[0][_LATEST_INDEX])
+
+    def view(self, frameNumber): # Vista sin copia del slot del frame (None si ya no está)
+        header, sequences, timestamps, slots = self._layout
+        slot = (frameNumber - 1) % len(slots)
+        if frameNumber <= 0 or sequences[slot] != 2 * frameNumber:
+            return None
+        return slots[slot]
+
+    def isValid(self, frameNumber): # Indica si el slot sigue conteniendo ese frame (usar después de leer una vista)
+        header, sequences, timestamps, slots = self._layout
+        return frameNumber > 0 and sequences[(frameNumber - 1) % len(slots)] == 2 * frameNumber
+
+    def timestamp(self, frameNumber): # Hora (time.time) en que se publicó el frame
+        header, sequences, timestamps, slots = self._layout
+        return float(timestamps[(frameNumber - 1) % len(slots)])
+
+    def read(self, out=None, retries=8): # Copiar el frame más reciente de forma consistente
+        """Devuelve (número de frame, frame) o (0, None) si no hay frames."""
+        for _ in range(retries):
+            frameNumber = self.latestFrameNumber
+            frame = self.view(frameNumber)
+            if frame is None: # Nada publicado o el escritor ya dio la vuelta
+                if frameNumber == 0:
+                    return 0, None
+                continue
+            if out is None:
+                out = numpy.empty_like(frame)
+            numpy.copyto(out, frame)
+            if self.isValid(frameNumber): # Nadie escribió el slot mientras se copiaba
+                return frameNumber, out
+        return 0, None
+
+    def readNext(self, lastFrameNumber, out=None, timeout=1.0, pollInterval=0.001): # Esperar un frame posterior a lastFrameNumber
+        deadline = time.monotonic() + timeout
+        while self.latestFrameNumber <= lastFrameNumber:
+            if time.monotonic() >= deadline:
+                return 0, None
+            time.sleep(pollInterval)
+        return self.read(out)
+
+    def close(self): # Soltar el segmento (no lo elimina)
+        self._layout = None
+        self._memory.close()
+
+def _slotBytes(frameBytes): # Tamaño de un slot alineado
+    return (frameBytes + _ALIGNMENT - 1) // _ALIGNMENT * _ALIGNMENT
+
+def _slotTableBytes(slots): # Secuencias y marcas de tiempo de cada slot, alineadas
+    return _slotBytes(16 * slots)
+
+def _dtypeField(buffer): # Bytes del tipo de dato en la cabecera
+    return numpy.ndarray((8,), numpy.uint8, buffer, offset=56)
+
+def _mapLayout(buffer, slots, shape, dtype): # Vistas numpy de cabecera, secuencias, marcas de tiempo y slots
+    dtype = numpy.dtype(dtype)
+    frameBytes = int(numpy.prod(shape)) * dtype.itemsize
+    header = numpy.ndarray((7,), numpy.int64, buffer)
+    sequences = numpy.ndarray((slots,), numpy.int64, buffer, offset=_HEADER_BYTES)
+    timestamps = numpy.ndarray((slots,), numpy.float64, buffer, offset=_HEADER_BYTES + 8 * slots)
+    dataOffset = _HEADER_BYTES + _slotTableBytes(slots)
+    slotArrays = numpy.ndarray((slots,) + tuple(shape), dtype, buffer, offset=dataOffset,
+                               strides=(_slotBytes(frameBytes),) + _contiguousStrides(shape, dtype.itemsize))
+    return header, sequences, timestamps, slotArrays
+
+def _contiguousStrides(shape, itemsize): # Strides de un arreglo C contiguo
+    strides = []
+    step = itemsize
+    for size in reversed(shape):
+        strides.append(step)
+        step *= size
+    return tuple(reversed(strides))
+
+def _attach(name): # Abrir un segmento existente sin que el lector lo elimine al salir
+    try:
+        return shared_memory.SharedMemory(name, track=False) # Python 3.13+
+    except TypeError:
+        memory = shared_memory.SharedMemory(name)
+        if memory.name not in _ownedNames: # En otro proceso, solo el publicador lo elimina
+            resource_tracker.unregister(memory._name, 'shared_memory')
+        return memory
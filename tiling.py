@@ -0,0 +1,99 @@
+import concurrent.futures
+import os
+import threading
+
+import numpy
+
+import filters
+
+class TiledExecutor(object): # Ejecuta filtros por franjas horizontales en un grupo de hilos
+    """Divide el frame en franjas con las filas de halo que pide cada filtro.
+
+    Los filtros puntuales (halo 0) se aplican directamente sobre vistas de
+    src y dst, sin copias. Los que necesitan vecinos procesan cada franja con
+    su halo en un buffer por franja y copian solo las filas interiores a dst,
+    así que el resultado no tiene costuras. Si src y dst comparten memoria se
+    hace una única copia de src en un buffer reutilizable. OpenCV libera el
+    GIL, por lo que los hilos trabajan en paralelo.
+    """
+    def __init__(self, workers=None, minStripeRows=32): # Inicializador con el tamaño del grupo
+        self._workers = workers or os.cpu_count() or 1 # Hilos de trabajo
+        self._minStripeRows = minStripeRows # Alto mínimo de una franja
+        self._pool = None # Grupo de hilos (se crea al primer uso)
+        self._local = threading.local() # Buffers de salida por hilo
+        self._sourceCopy = None # Copia reutilizable de src cuando src y dst comparten memoria
+
+    @property
+    def workers(self):
+        return self._workers # Número de hilos
+
+    def wrap(self, filterObj): # Envolver un filtro para que se aplique por franjas
+        return TiledFilter(filterObj, self)
+
+    def run(self, filterObj, src, dst): # Aplicar un filtro por franjas
+        halo = filters.filterHalo(filterObj)
+        stripes = self._stripes(src.shape[0])
+        if halo is None or len(stripes) < 2: # No se puede dividir o no vale la pena
+            filters.applyFilter(filterObj, src, dst)
+            return
+        if halo == 0: # Filtro puntual: vistas de src y dst, sin copias
+            self._map(lambda top, bottom: filters.applyFilter(filterObj, src[top:bottom], dst[top:bottom]), stripes)
+            return
+        source = src
+        if numpy.may_share_memory(src, dst): # Las franjas vecinas leerían filas ya filtradas
+            if self._sourceCopy is None or self._sourceCopy.shape != src.shape or self._sourceCopy.dtype != src.dtype:
+                self._sourceCopy = numpy.empty_like(src)
+            numpy.copyto(self._sourceCopy, src)
+            source = self._sourceCopy
+        rows = src.shape[0]
+        def applyStripe(top, bottom): # Filtrar una franja con su halo y copiar las filas interiores
+            windowTop, windowBottom = max(0, top - halo), min(rows, bottom + halo)
+            window = source[windowTop:windowBottom]
+            output = self._outputBuffer(window)
+            filters.applyFilter(filterObj, window, output)
+            dst[top:bottom] = output[top - windowTop:bottom - windowTop]
+        self._map(applyStripe, stripes)
+
+    def shutdown(self): # Detener el grupo de hilos
+        if self._pool is not None:
+            self._pool.shutdown()
+            self._pool = None
+
+    def _stripes(self, rows): # Límites (inicio, fin) de cada franja
+        count = max(1, min(self._workers, rows // self._minStripeRows))
+        bounds = [rows * i // count for i in range(count + 1)]
+        return list(zip(bounds[:-1], bounds[1:]))
+
+    def _map(self, func, stripes): # Ejecutar func en cada franja y esperar a todas
+        if self._pool is None:
+            self._pool = concurrent.futures.ThreadPoolExecutor(self._workers, thread_name_prefix='TiledExecutor')
+        futures = [self._pool.submit(func, top, bottom) for top, bottom in stripes]
+        for future in futures:
+            future.result() # Propagar excepciones
+
+    def _outputBuffer(self, window): # Buffer de salida del hilo actual con la forma de la ventana
+        buffers = getattr(self._local, 'buffers', None)
+        if buffers is None:
+            buffers = self._local.buffers = {}
+        key = (window.shape, window.dtype)
+        if key not in buffers:
+            if len(buffers) >= 4: # Las franjas del borde tienen ventanas más cortas
+                buffers.clear()
+            buffers[key] = numpy.empty_like(window)
+        return buffers[key]
+
+class TiledFilter(object): # Filtro que se aplica a través de un TiledExecutor
+    def __init__(self, filterObj, executor): # Inicializador con el filtro y el ejecutor
+        self._filterObj = filterObj # Filtro envuelto
+        self._executor = executor # Ejecutor por franjas
+
+    @property
+    def filterObj(self):
+        return self._filterObj # Filtro envuelto
+
+    @property
+    def halo(self):
+        return filters.filterHalo(self._filterObj) # Mismo halo que el filtro envuelto
+
+    def apply(self, src, dst): # Aplicar el filtro por franjas
+        self._executor.run(self._filterObj, src, dst)
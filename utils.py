@@ -1,10 +1,18 @@
+import hashlib
+import json
+import os
+import tempfile
+
 import cv2
 import numpy
-import scipy.interpolate
+
+_lookupTableCache = {} # Tablas de curvas ya compiladas en este proceso, por clave de contenido
+_LOOKUP_TABLE_CACHE_VERSION = 1 # Cambiar si cambia la forma de compilar las curvas
 
 def createCurveFunc(points): # Crear una función de curva a partir de puntos dados
     if points is None or len(points) < 2: # 
         return None # Si no hay suficientes puntos, devolver None
+    import scipy.interpolate # Importar scipy solo cuando hace falta compilar una curva
     xs, ys = zip(*points) # Separar puntos en coordenadas x e y
     kind = 'linear' if len(points) < 4 else 'cubic' # Elegir tipo de interpolación
     return scipy.interpolate.interp1d(xs, ys, kind, bounds_error=False) # Crear y devolver la función de interpolación
@@ -12,11 +20,94 @@ def createCurveFunc(points): # Crear una función de curva a partir de puntos da
 def createLookupArray(func, length=256): # Crear un arreglo de búsqueda a partir de una función dada
     if func is None: # Si la función es None
         return None # Devolver None
-    lookupArray = numpy.empty(length) # Crear un arreglo vacío
-    for i in range(length): # Rellenar el arreglo con valores de la función
-        func_i = func(i) # Evaluar la función en i
-        lookupArray[i] = numpy.clip(func_i, 0, length - 1) # Asegurarse de que el valor esté dentro de los límites
-    return lookupArray # Devolver el arreglo de búsqueda
+    inputs = numpy.arange(length, dtype=numpy.float64)
+    try:
+        values = numpy.asarray(func(inputs), dtype=numpy.float64) # Evaluar la función en todas las entradas a la vez
+    except (TypeError, ValueError): # Función escalar (p. ej. usa min o if): evaluar entrada por entrada
+        values = None
+    if values is None or values.shape != inputs.shape:
+        values = numpy.array([func(i) for i in range(length)], dtype=numpy.float64) # Igual que antes: enteros de Python
+    return numpy.clip(values, 0, length - 1) # Asegurarse de que los valores estén dentro de los límites
+
+def createLookupTable(funcs, dtype=numpy.uint8): # Compilar funciones (una por canal) en una tabla entera
+    length = numpy.iinfo(dtype).max + 1 # Número de entradas de la tabla
+    lookupTable = numpy.empty((length, len(funcs)), dtype) # Una columna por canal
+    for channel, func in enumerate(funcs): # Evaluar la función de cada canal
+        lookupArray = createLookupArray(func, length)
+        if lookupArray is None: # Sin función: identidad
+            lookupArray = numpy.arange(length)
+        lookupTable[:, channel] = lookupArray # Truncar al tipo entero, igual que applyLookupArray
+    return lookupTable # Devolver la tabla compilada
+
+def createCurveLookupTable(channelPoints, vPoints=None, dtype=numpy.uint8): # Compilar curvas por canal con cache en disco
+    """Devuelve la tabla (entradas x canales) de las curvas dadas.
+
+    Cada canal aplica su curva después de la curva de valor vPoints. Las
+    tablas se guardan en un cache direccionado por contenido (puntos de
+    control y tipo de dato), así que scipy solo se importa cuando falta una.
+    """
+    key = _curveCacheKey(channelPoints, vPoints, dtype)
+    lookupTable = _lookupTableCache.get(key)
+    if lookupTable is None:
+        lookupTable = _loadCachedLookupTable(key, len(channelPoints), dtype)
+        if lookupTable is None: # No está en disco: compilar y guardar
+            vFunc = createCurveFunc(vPoints)
+            lookupTable = createLookupTable(
+                [createCompositeFunc(createCurveFunc(points), vFunc) for points in channelPoints], dtype)
+            _saveCachedLookupTable(key, lookupTable)
+        lookupTable.flags.writeable = False # La tabla se comparte entre filtros
+        _lookupTableCache[key] = lookupTable
+    return lookupTable
+
+def getLookupTableCacheDir(): # Directorio del cache de tablas (CAMEO_CACHE_DIR o ~/.cache/cameo)
+    cacheDir = os.environ.get('CAMEO_CACHE_DIR') or os.path.join(os.path.expanduser('~'), '.cache', 'cameo')
+    return os.path.join(cacheDir, 'luts')
+
+def _curveCacheKey(channelPoints, vPoints, dtype): # Hash del contenido que define la tabla
+    def normalize(points):
+        return None if points is None else [[float(x), float(y)] for x, y in points]
+    content = json.dumps({
+        'version': _LOOKUP_TABLE_CACHE_VERSION,
+        'dtype': numpy.dtype(dtype).str,
+        'vPoints': normalize(vPoints),
+        'channelPoints': [normalize(points) for points in channelPoints]}, sort_keys=True)
+    return hashlib.sha256(content.encode('utf-8')).hexdigest()
+
+def _loadCachedLookupTable(key, channels, dtype): # Leer una tabla del cache en disco (None si no está)
+    path = os.path.join(getLookupTableCacheDir(), key + '.npy')
+    try:
+        lookupTable = numpy.load(path, allow_pickle=False)
+    except (OSError, ValueError): # No existe o está corrupta
+        return None
+    length = numpy.iinfo(dtype).max + 1
+    if lookupTable.shape != (length, channels) or lookupTable.dtype != numpy.dtype(dtype):
+        return None
+    return lookupTable
+
+def _saveCachedLookupTable(key, lookupTable): # Guardar una tabla en el cache en disco (sin fallar)
+    cacheDir = getLookupTableCacheDir()
+    try:
+        os.makedirs(cacheDir, exist_ok=True)
+        fd, tempPath = tempfile.mkstemp(dir=cacheDir, suffix='.tmp') # Escribir aparte y renombrar
+        with os.fdopen(fd, 'wb') as tempFile:
+            numpy.save(tempFile, lookupTable, allow_pickle=False)
+        os.replace(tempPath, os.path.join(cacheDir, key + '.npy')) # Renombrado atómico
+    except OSError: # Sin permisos o sin espacio: el cache es opcional
+        pass
+
+def composeLookupTables(first, second): # Tabla equivalente a aplicar first y después second
+    channels = max(first.shape[1], second.shape[1]) # Una tabla de un canal se aplica a todos
+    first = numpy.broadcast_to(first, (first.shape[0], channels))
+    second = numpy.broadcast_to(second, (second.shape[0], channels))
+    return second[first, numpy.arange(channels)] # Indexar la segunda con la salida de la primera
+
+def applyLookupTable(lookupTable, src, dst): # Aplicar una tabla compilada en una sola pasada
+    if src.dtype == numpy.uint8 and lookupTable.dtype == numpy.uint8: # Ruta rápida de OpenCV
+        cv2.LUT(src, lookupTable.reshape(256, 1, -1), dst) # Todos los canales a la vez, admite src is dst
+    elif lookupTable.shape[1] == 1: # Misma tabla para todos los canales
+        dst[...] = lookupTable[src, 0]
+    else: # Una columna de la tabla por canal
+        dst[...] = lookupTable[src, numpy.arange(lookupTable.shape[1])]
 
 def applyLookupArray(lookupArray, src, dst): # Aplicar un arreglo de búsqueda a una imagen fuente para obtener una imagen destino
     if lookupArray is None: # Si el arreglo de búsqueda es None
@@ -30,6 +121,40 @@ def createCompositeFunc(func0, func1): # Crear una función compuesta a partir d
         return func0 # Devolver la primera función
     return lambda x: func0(func1(x)) # Devolver la función compuesta
 
+def separateKernel(kernel, tolerance=1e-6): # Separar un kernel de rango 1 en dos kernels 1-D
+    if kernel.shape[0] == 1: # Ya es 1-D horizontal: la pasada vertical es la identidad
+        return kernel.reshape(1, -1).astype(numpy.float32), numpy.ones((1, 1), numpy.float32)
+    if kernel.shape[1] == 1: # Ya es 1-D vertical: la pasada horizontal es la identidad
+        return numpy.ones((1, 1), numpy.float32), kernel.reshape(-1, 1).astype(numpy.float32)
+    u, s, vt = numpy.linalg.svd(kernel.astype(numpy.float64)) # Descomposición en valores singulares
+    if s[0] == 0 or s[1] > tolerance * s[0]: # Rango mayor que 1: no es separable
+        return None
+    scale = numpy.sqrt(s[0]) # Repartir el valor singular entre ambos factores
+    if vt[0].sum() < 0: # La SVD puede devolver ambos factores con signo negativo
+        scale = -scale
+    kernelX = _symmetrize(vt[0] * scale, tolerance).reshape(1, -1) # Factor horizontal
+    kernelY = _symmetrize(u[:, 0] * scale, tolerance).reshape(-1, 1) # Factor vertical
+    return kernelX, kernelY
+
+def _symmetrize(factor, tolerance): # Quitar el ruido numérico de factores (anti)simétricos
+    reversedFactor = factor[::-1]
+    if numpy.allclose(factor, reversedFactor, rtol=0, atol=tolerance): # OpenCV acelera kernels simétricos
+        factor = (factor + reversedFactor) / 2
+    elif numpy.allclose(factor, -reversedFactor, rtol=0, atol=tolerance): # y antisimétricos
+        factor = (factor - reversedFactor) / 2
+    return factor.astype(numpy.float32)
+
+def isBoxKernel(kernel, tolerance=1e-6): # Indica si el kernel es un promedio uniforme
+    return bool(numpy.allclose(kernel, 1.0 / kernel.size, rtol=0, atol=tolerance))
+
+def composeKernels(first, second): # Kernel equivalente a correlacionar con first y después con second
+    firstRows, firstCols = first.shape
+    secondRows, secondCols = second.shape
+    composed = numpy.zeros((firstRows + secondRows - 1, firstCols + secondCols - 1), numpy.float32)
+    for (row, col), weight in numpy.ndenumerate(second): # Convolución completa de ambos kernels
+        composed[row:row + firstRows, col:col + firstCols] += weight * first
+    return composed
+
 def createFlatView(array): # Crear una vista plana de un arreglo numpy
     flatView = array.view() # Crear una vista del arreglo
     flatView.shape = array.size # Cambiar la forma a una dimensión
@@ -0,0 +1,336 @@
+import collections
+import os
+import queue
+import threading
+import time
+
+import cv2
+import numpy
+
+class AsyncWriter(object): # Escritor asíncrono genérico con un hilo de trabajo
+    """Mueve la codificación y la escritura a disco a un hilo de trabajo.
+
+    Los frames se copian a un conjunto acotado de buffers que se reciclan
+    entre escrituras. Cuando todos los buffers están en la cola, la política
+    decide si se descarta el frame (DROP) o si el llamador espera (BLOCK).
+    cv2 libera el GIL al codificar, por lo que un hilo es suficiente.
+    """
+
+    DROP = 'drop' # Descartar el frame si la cola está llena
+    BLOCK = 'block' # Esperar a que haya un buffer libre
+
+    def __init__(self, queueSize=8, overflowPolicy=DROP): # Inicializador con tamaño de cola y política
+        if overflowPolicy not in (AsyncWriter.DROP, AsyncWriter.BLOCK):
+            raise ValueError(f"Política de desbordamiento desconocida: {overflowPolicy}")
+        self._queueSize = max(1, queueSize) # Número máximo de buffers en vuelo
+        self._overflowPolicy = overflowPolicy # Política cuando la cola está llena
+        self._freeBuffers = collections.deque() # Buffers libres para reciclar
+        self._allocatedBuffers = 0 # Buffers creados hasta ahora
+        self._condition = threading.Condition() # Protege el conjunto de buffers
+        self._jobs = queue.Queue() # Cola de trabajos (buffer, argumentos)
+        self._droppedFrames = 0 # Frames descartados por falta de buffers
+        self._writtenFrames = 0 # Frames escritos por el hilo de trabajo
+        self._lastWriteLatency = 0.0 # Latencia de la última escritura en segundos
+        self._totalWriteLatency = 0.0 # Suma de latencias para el promedio
+        self._maxWriteLatency = 0.0 # Latencia máxima observada
+        self._failedWrites = 0 # Escrituras que lanzaron una excepción
+        self._lastError = None # Última excepción del hilo de trabajo
+        self._closed = False # Indica si ya no se aceptan trabajos
+        self._thread = threading.Thread(target=self._run, name=type(self).__name__, daemon=True)
+        self._thread.start() # Iniciar el hilo de trabajo
+
+    @property
+    def queueDepth(self):
+        return self._jobs.qsize() # Trabajos pendientes de escribir
+
+    @property
+    def droppedFrames(self):
+        return self._droppedFrames # Frames descartados
+
+    @property
+    def writtenFrames(self):
+        return self._writtenFrames # Frames escritos
+
+    @property
+    def failedWrites(self):
+        return self._failedWrites # Escrituras fallidas
+
+    @property
+    def lastError(self):
+        return self._lastError # Última excepción del hilo de trabajo (None si no hubo)
+
+    @property
+    def lastWriteLatency(self):
+        return self._lastWriteLatency # Latencia de la última escritura
+
+    @property
+    def meanWriteLatency(self):
+        if self._writtenFrames == 0:
+            return 0.0
+        return self._totalWriteLatency / self._writtenFrames # Latencia promedio
+
+    @property
+    def maxWriteLatency(self):
+        return self._maxWriteLatency # Latencia máxima
+
+    def flush(self): # Esperar a que se escriban los trabajos pendientes
+        if not self._closed:
+            self._jobs.join()
+
+    def close(self): # Vaciar la cola y detener el hilo de trabajo
+        if self._closed:
+            return
+        self._closed = True
+        self._jobs.put(None) # Centinela de fin
+        self._thread.join()
+
+    def _submit(self, frame, *args): # Encolar una copia del frame; devuelve False si se descartó
+        if self._closed:
+            return False
+        buffer = self._acquireBuffer(frame)
+        if buffer is None: # Cola llena con política DROP
+            return False
+        numpy.copyto(buffer, frame) # Copiar al buffer reciclado
+        self._jobs.put((buffer, args))
+        return True
+
+    def _acquireBuffer(self, frame): # Obtener un buffer libre con la forma del frame
+        with self._condition:
+            while True:
+                while self._freeBuffers:
+                    buffer = self._freeBuffers.popleft()
+                    if buffer.shape == frame.shape and buffer.dtype == frame.dtype:
+                        return buffer
+                    self._allocatedBuffers -= 1 # Cambió el tamaño: soltar el buffer viejo
+                if self._allocatedBuffers < self._bufferLimit():
+                    self._allocatedBuffers += 1
+                    return numpy.empty_like(frame)
+                if self._overflowPolicy == AsyncWriter.DROP:
+                    self._droppedFrames += 1
+                    return None
+                self._condition.wait() # BLOCK: esperar a que el hilo libere un buffer
+
+    def _releaseBuffer(self, buffer): # Devolver un buffer al conjunto libre
+        with self._condition:
+            if self._allocatedBuffers > self._bufferLimit(): # Sobran buffers: soltarlo
+                self._allocatedBuffers -= 1
+            else:
+                self._freeBuffers.append(buffer)
+            self._condition.notify()
+
+    def _bufferLimit(self): # Buffers que pueden estar en vuelo (las subclases pueden ampliarlo)
+        return self._queueSize
+
+    def _run(self): # Bucle del hilo de trabajo
+        while True:
+            job = self._jobs.get()
+            if job is None: # Centinela: terminar
+                break
+            buffer, args = job
+            startTime = time.perf_counter()
+            try:
+                self._write(buffer, *args) # Codificar y escribir en disco
+                latency = time.perf_counter() - startTime
+                self._lastWriteLatency = latency
+                self._totalWriteLatency += latency
+                self._maxWriteLatency = max(self._maxWriteLatency, latency)
+                self._writtenFrames += 1
+            except Exception as error: # El hilo sigue vivo: registrar el error y continuar
+                self._failedWrites += 1
+                self._lastError = error
+            finally:
+                if buffer is not None: # Los trabajos ya codificados no usan buffer
+                    self._releaseBuffer(buffer)
+                self._jobs.task_done()
+        try:
+            self._finish()
+        except Exception as error:
+            self._failedWrites += 1
+            self._lastError = error
+
+    def _write(self, frame, *args): # Escribir un frame (implementado por las subclases)
+        raise NotImplementedError
+
+    def _finish(self): # Liberar recursos al terminar el hilo
+        pass
+
+class AsyncImageWriter(AsyncWriter): # Escritor asíncrono de imágenes (capturas de pantalla)
+    def __init__(self, queueSize=2, overflowPolicy=AsyncWriter.BLOCK): # Las capturas no se descartan por defecto
+        super().__init__(queueSize, overflowPolicy)
+
+    def write(self, filename, frame): # Encolar la escritura de una imagen
+        return self._submit(frame, filename)
+
+    def _write(self, frame, filename):
+        cv2.imwrite(filename, frame) # Guardar la imagen
+
+class PreRollBuffer(AsyncWriter): # Últimos segundos de video comprimidos en JPEG, en memoria
+    """Conserva los frames recientes como bytes JPEG en un anillo acotado.
+
+    La codificación se hace en el hilo de trabajo. Se descartan los frames
+    más antiguos que seconds respecto al más reciente y, si aun así se supera
+    maxBytes, los más antiguos hasta caber. drain() entrega el contenido para
+    volcarlo al inicio de una grabación.
+    """
+    def __init__(self, seconds=5.0, maxBytes=64 * 1024 * 1024, quality=80,
+                 queueSize=2, overflowPolicy=AsyncWriter.DROP): # Inicializador con duración, bytes máximos y calidad JPEG
+        self._seconds = seconds # Duración máxima del anillo
+        self._maxBytes = maxBytes # Bytes máximos del anillo
+        self._encodeParams = [cv2.IMWRITE_JPEG_QUALITY, quality] # Parámetros de codificación
+        self._frames = collections.deque() # (marca de tiempo, bytes JPEG), del más antiguo al más nuevo
+        self._bytes = 0 # Bytes ocupados por el anillo
+        self._lock = threading.Lock() # Protege el anillo
+        super().__init__(queueSize, overflowPolicy)
+
+    @property
+    def frameCount(self):
+        return len(self._frames) # Frames en el anillo
+
+    @property
+    def byteCount(self):
+        return self._bytes # Bytes ocupados
+
+    @property
+    def duration(self): # Segundos cubiertos por el anillo
+        with self._lock:
+            if not self._frames:
+                return 0.0
+            return self._frames[-1][0] - self._frames[0][0]
+
+    def add(self, frame, timestamp): # Encolar un frame para codificarlo
+        return self._submit(frame, timestamp)
+
+    def drain(self): # Sacar todos los frames (esperando a los que se están codificando)
+        self.flush()
+        with self._lock:
+            frames = list(self._frames)
+            self._frames.clear()
+            self._bytes = 0
+        return frames
+
+    def _write(self, frame, timestamp):
+        ok, encoded = cv2.imencode('.jpg', frame, self._encodeParams) # Comprimir (cv2 libera el GIL)
+        if not ok:
+            return
+        data = encoded.tobytes()
+        with self._lock:
+            self._frames.append((timestamp, data))
+            self._bytes += len(data)
+            while self._frames and (timestamp - self._frames[0][0] > self._seconds or
+                                    self._bytes > self._maxBytes): # Quitar los más antiguos
+                self._bytes -= len(self._frames.popleft()[1])
+
+class SegmentedVideoWriter(AsyncWriter): # Escritor asíncrono de video por segmentos con marcas de tiempo reales
+    """Escribe video a FPS nominales respetando las marcas de tiempo de los frames.
+
+    Cada frame ocupa las posiciones de su marca de tiempo: si la fuente va más
+    lenta que fps se repite el frame y si va más rápida se descarta. El
+    archivo se rota cuando el segmento supera segmentSeconds o segmentBytes;
+    los segmentos se llaman nombre_000.ext, nombre_001.ext... (sin límites se
+    usa el nombre tal cual). El tamaño se toma del primer frame. Mientras
+    quedan frames del pre-roll por escribir, el conjunto de buffers crece en
+    tantos buffers como frames tiene el pre-roll, para que los frames en vivo
+    que esperan detrás no se descarten.
+    """
+    def __init__(self, filename, fourcc=cv2.VideoWriter_fourcc(*'MJPG'), fps=30.0, segmentSeconds=None,
+                 segmentBytes=None, maxGapSeconds=1.0, queueSize=8, overflowPolicy=AsyncWriter.DROP): # Inicializador
+        self._filename = filename # Nombre base de los archivos
+        self._fourcc = fourcc # Códec
+        self._fps = fps # FPS nominales del contenedor
+        self._segmentSeconds = segmentSeconds # Duración máxima de un segmento (None: sin límite)
+        self._segmentBytes = segmentBytes # Tamaño máximo de un segmento (None: sin límite)
+        self._maxGapSeconds = maxGapSeconds # Huecos más largos no se rellenan repitiendo frames
+        self._videoWriter = None # Escritor del segmento actual
+        self._segmentFilenames = [] # Archivos escritos
+        self._segmentStart = None # Marca de tiempo del primer frame del segmento
+        self._segmentFrames = 0 # Frames escritos en el segmento (incluidas repeticiones)
+        self._sizeCheckFrames = 0 # Valor de _segmentFrames en la última revisión del tamaño
+        self._duplicatedFrames = 0 # Frames repetidos para respetar las marcas de tiempo
+        self._skippedFrames = 0 # Frames descartados por llegar antes de su posición
+        self._pendingEncoded = 0 # Frames del pre-roll pendientes de escribir
+        self._catchUpBuffers = 0 # Buffers extra mientras se escribe el pre-roll
+        super().__init__(queueSize, overflowPolicy)
+
+    @property
+    def segmentFilenames(self):
+        return list(self._segmentFilenames) # Archivos escritos hasta ahora
+
+    @property
+    def duplicatedFrames(self):
+        return self._duplicatedFrames # Frames repetidos
+
+    @property
+    def skippedFrames(self):
+        return self._skippedFrames # Frames descartados por la marca de tiempo
+
+    def isOpened(self): # El archivo se abre con el primer frame
+        return not self._closed
+
+    def write(self, frame, timestamp=None): # Encolar un frame con su marca de tiempo (time.monotonic)
+        return self._submit(frame, time.monotonic() if timestamp is None else timestamp, None)
+
+    def writeEncoded(self, data, timestamp): # Encolar un frame ya comprimido (JPEG), sin descartarlo
+        if self._closed:
+            return False
+        with self._condition:
+            self._pendingEncoded += 1
+            self._catchUpBuffers += 1 # Los frames en vivo esperan detrás de este
+        self._jobs.put((None, (timestamp, data)))
+        return True
+
+    def release(self): # Escribir los frames pendientes y cerrar el archivo
+        self.close()
+
+    def _write(self, frame, timestamp, data):
+        if frame is None: # Frame del pre-roll: descomprimir en este hilo
+            try:
+                frame = cv2.imdecode(numpy.frombuffer(data, numpy.uint8), cv2.IMREAD_COLOR)
+            finally:
+                self._encodedWritten()
+            if frame is None:
+                return
+        if self._videoWriter is None or self._shouldRotate(timestamp):
+            self._openSegment(frame, timestamp)
+        position = round((timestamp - self._segmentStart) * self._fps) # Posición según la marca de tiempo
+        if position < self._segmentFrames: # Llegó antes de su posición: ya hay un frame ahí
+            self._skippedFrames += 1
+            return
+        repeats = min(position - self._segmentFrames, int(self._maxGapSeconds * self._fps)) # Rellenar huecos
+        for _ in range(repeats + 1):
+            self._videoWriter.write(frame)
+        self._duplicatedFrames += repeats
+        self._segmentFrames = position + 1
+
+    def _encodedWritten(self): # Un frame del pre-roll menos en la cola
+        with self._condition:
+            self._pendingEncoded -= 1
+            if self._pendingEncoded == 0: # Pre-roll escrito: volver al tamaño normal
+                self._catchUpBuffers = 0
+
+    def _bufferLimit(self):
+        return self._queueSize + self._catchUpBuffers
+
+    def _shouldRotate(self, timestamp): # Indica si el segmento actual llegó a su límite
+        if self._segmentSeconds is not None and timestamp - self._segmentStart >= self._segmentSeconds:
+            return True
+        if self._segmentBytes is not None and self._segmentFrames - self._sizeCheckFrames >= max(1, int(self._fps)): # Revisar el tamaño una vez por segundo
+            self._sizeCheckFrames = self._segmentFrames
+            return os.path.getsize(self._segmentFilenames[-1]) >= self._segmentBytes
+        return False
+
+    def _openSegment(self, frame, timestamp): # Cerrar el segmento actual y abrir el siguiente
+        if self._videoWriter is not None:
+            self._videoWriter.release()
+        filename = self._filename
+        if self._segmentSeconds is not None or self._segmentBytes is not None:
+            root, extension = os.path.splitext(self._filename)
+            filename = f"{root}_{len(self._segmentFilenames):03d}{extension}"
+        frameSize = (frame.shape[1], frame.shape[0])
+        self._videoWriter = cv2.VideoWriter(filename, self._fourcc, self._fps, frameSize)
+        self._segmentFilenames.append(filename)
+        self._segmentStart = timestamp
+        self._segmentFrames = self._sizeCheckFrames = 0
+
+    def _finish(self):
+        if self._videoWriter is not None:
+            self._videoWriter.release() # Cerrar el último segmento